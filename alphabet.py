@@ -0,0 +1,95 @@
+import make_alphabet
+
+##############################################################################################################
+
+class Alphabet:
+
+    ##########################################################################################################
+
+    def __init__(self, symbols):
+        '''
+        Alphabet constructor.
+        Gives each symbol (three hexadecimal characters) a dense integer id, in the order the symbols are passed.
+        Words are tuples of these ids, so they can be hashed, sliced and concatenated (access string + b + d) without any string work
+        :param symbols: the list of three-character symbols in the alphabet
+        '''
+
+        self.symbols = list(symbols)
+
+        # Map each symbol to its id so that lookups do not have to scan the alphabet
+        self.ids = {symbol : i for i, symbol in enumerate(self.symbols)}
+
+        assert len(self.ids) == len(self.symbols)
+
+        # Each symbol decoded into its three hexadecimal characters: (property, matrix index, list index)
+        self.decoded = [tuple(int(char, 16) for char in symbol) for symbol in self.symbols]
+
+    ##########################################################################################################
+
+    @classmethod
+    def from_file(cls, file_path):
+        '''
+        Reads an alphabet written by make_alphabet.write_alphabet() (one symbol per line)
+        :param file_path: the path of the text file holding the alphabet
+        '''
+
+        with open(file_path, "r") as alphabet_file:
+            return cls([line.strip() for line in alphabet_file if line.strip()])
+
+    @classmethod
+    def from_validity(cls):
+        '''Builds the alphabet of every symbol accepted by make_alphabet.check_validity(), in the same order as make_alphabet.write_alphabet()'''
+        return cls([symbol for symbol in (f"{i:03x}" for i in range(16**3)) if make_alphabet.check_validity(symbol)])
+
+    ##########################################################################################################
+
+    def __len__(self):
+        '''Returns the number of symbols in the alphabet'''
+        return len(self.symbols)
+
+    def __iter__(self):
+        '''Iterates over the symbols of the alphabet (in order of their ids)'''
+        return iter(self.symbols)
+
+    def __getitem__(self, symbol_id : int):
+        '''Returns the symbol with the given id'''
+        return self.symbols[symbol_id]
+
+    def __contains__(self, symbol : str):
+        '''Returns a boolean indicating if the given symbol is in the alphabet'''
+        return symbol in self.ids
+
+    ##########################################################################################################
+
+    def id_of(self, symbol : str):
+        '''
+        Returns the id of the given symbol
+        :param symbol: a three-character symbol in the alphabet
+        '''
+        return self.ids[symbol]
+
+    ##########################################################################################################
+
+    def encode(self, s : str):
+        '''
+        Converts a string of concatenated 3-character symbols into a word (tuple of symbol ids)
+        :param s: the string being encoded
+        '''
+
+        assert len(s) % 3 == 0
+
+        ids = self.ids
+        return tuple(ids[s[i : i + 3]] for i in range(0, len(s), 3))
+
+    def decode(self, word):
+        '''
+        Converts a word (sequence of symbol ids) back into a string of concatenated 3-character symbols
+        :param word: the word being decoded
+        '''
+
+        symbols = self.symbols
+        return "".join(symbols[symbol_id] for symbol_id in word)
+
+    ##########################################################################################################
+
+##############################################################################################################
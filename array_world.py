@@ -0,0 +1,1021 @@
+import contextlib
+import io
+
+import numpy as np
+
+from hex_world import Ident, World
+
+'''
+Struct-of-arrays simulation engine for the Hex World.
+Array_World advances a World with the same rules as World.update(), but keeps every ident as a row of NumPy arrays (hex, state, serial number)
+instead of as an Ident object, so that advancing/flipping and the common collisions are done for all idents at once.
+
+Collisions involving stationary idents (and the superimposition fix-up they can cause) depend on the order in which World.update() visits the idents,
+so they are resolved one ident at a time, but only for the few hexes they can reach; every other hex is resolved with array operations.
+The engine keeps the same bookkeeping as the object engine (which copies of an ident are in the ident list, which are in the hexes, which are agents),
+so both engines produce the same frames; cross_check() compares them.
+
+An Array_World can also hold many independent worlds, stacked in the same arrays, which it advances in lockstep (ex. for rollout statistics):
+each frame costs a fixed number of array operations however many worlds there are, and a world stops being advanced once its agent reaches a goal.
+'''
+
+##############################################################################################################
+
+class Array_World:
+
+    # Entries standing for the wall and the goalpost kept in a hex (in the per-hex lists used for the order-dependent collisions), as opposed to ident ids (>= 0)
+    WALL_ENTRY = -2
+    GOAL_ENTRY = -3
+
+    # Number of directions in each 6-bit direction mask
+    BIT_COUNTS = np.array([bin(mask).count("1") for mask in range(64)])
+
+    # Result of a collision for which the object engine fails an assertion
+    INVALID = -9
+
+    # Number of superimposition checks per hex in one frame after which a world is taken to be stepping idents back forever
+    # (the worlds which do settle need a handful of checks per frame, far fewer than they have hexes)
+    MAX_DOUBLE_CHECKS_PER_HEX = 1
+
+    # Each ident resolved in a frame gets KEY_STRIDE consecutive positions in the new ident list, as resolving one collision can append several idents
+    KEY_STRIDE = 16
+
+    # Filled in below the class (the table needs Array_World.INVALID)
+    MOVING_COLLISIONS = None
+
+    ##########################################################################################################
+
+    def __init__(self, worlds):
+        '''
+        Array_World constructor.
+        Copies the idents, walls, goals and agents of one or more Worlds into arrays (the Worlds themselves are not changed, and are not used afterwards).
+        Several worlds are stacked one after the other in the same arrays (as if they were one larger world whose parts never touch),
+        so that each update() advances all of them at once.
+        Goals must be in world.goals only (as made by Hex.make_goal()), not in world.ident_list
+        :param worlds: the World to copy, or a list of Worlds (whose hex matrices have the same size)
+        '''
+
+        if isinstance(worlds, World):
+            worlds = [worlds]
+        self.num_worlds = len(worlds)
+        assert self.num_worlds > 0
+
+        self.rows = len(worlds[0].hex_matrix)
+        self.cols = len(worlds[0].hex_matrix[0])
+        assert all(len(world.hex_matrix) == self.rows and all(len(hex_list) == self.cols for hex_list in world.hex_matrix) for world in worlds)
+
+        # The hexes of world b are the cells b * world_cells to (b + 1) * world_cells - 1
+        self.world_cells = self.rows * self.cols
+        self.num_cells = self.num_worlds * self.world_cells
+
+        # neighbors[cell, dir] is the hex next to cell in direction dir, or -1 if there is none
+        self.neighbors = self.__neighbor_table(worlds[0])
+
+        # Every copy of an ident made by the engine is a row of these arrays (the ident list, the hexes and the agent list hold row ids).
+        # serial holds serial number * num_worlds + world index, so that the idents of different worlds never share a serial number
+        self.num_idents = 0
+        self.cell = np.zeros(64, dtype=np.int64)
+        self.state = np.zeros(64, dtype=np.int64)
+        self.serial = np.zeros(64, dtype=np.int64)
+        self.agent = np.zeros(64, dtype=bool)
+
+        ident_list = []
+        agents = []
+        matrix = []
+
+        # Walls and goalposts stay in their hexes from frame to frame (until a hex is replaced by a corrected one)
+        self.kept_wall = np.zeros(self.num_cells, dtype=bool)
+        self.kept_goal = np.zeros(self.num_cells, dtype=bool)
+
+        # Hexes holding a goal (according to world.goals, which the agents and the end of the game use)
+        self.goal_here = np.zeros(self.num_cells, dtype=bool)
+        self.has_goals = np.zeros(self.num_worlds, dtype=bool)
+
+        # Twice the axial distance (see World.axial_distance()) from each hex to the closest goal of its world
+        self.goal_distance = np.zeros(self.num_cells, dtype=np.int64)
+
+        for b, world in enumerate(worlds):
+            first_cell = b * self.world_cells
+
+            ids = {}
+            def ident_id(ident):
+                if id(ident) not in ids:
+                    ids[id(ident)] = self.__add_ident(first_cell + ident.matrix_index * self.cols + ident.list_index, ident.state,
+                                                      ident.serial_number * self.num_worlds + b, ident.property == "agent")
+                return ids[id(ident)]
+
+            assert all(ident.property != "goal" for ident in world.ident_list)
+            ident_list.extend(ident_id(ident) for ident in world.ident_list)
+            agents.extend(ident_id(agent) for agent in world.agents)
+
+            # The idents in the hexes of the world (usually the same as the ident list, but the superimposition fix-up can make them differ)
+            for hex_list in world.hex_matrix:
+                for hex in hex_list:
+                    cell = first_cell + hex.matrix_index * self.cols + hex.list_index
+                    for ident in hex.idents:
+                        if ident.state == -2:
+                            self.kept_wall[cell] = True
+                        elif ident.property == "goal":
+                            self.kept_goal[cell] = True
+                        else:
+                            matrix.append(ident_id(ident))
+
+            goal_cells = np.array([goal.matrix_index * self.cols + goal.list_index for goal in world.goals], dtype=np.int64)
+            self.goal_here[first_cell + goal_cells] = True
+            self.has_goals[b] = len(goal_cells) > 0
+
+            if len(goal_cells):
+                cells = np.arange(self.world_cells)
+                d_matrix_index = (cells // self.cols)[:, None] - goal_cells[None, :] // self.cols
+                d_list_index = (cells % self.cols)[:, None] - goal_cells[None, :] % self.cols
+                self.goal_distance[first_cell : first_cell + self.world_cells] = (np.abs(d_matrix_index) + np.abs(d_matrix_index + d_list_index) + np.abs(d_list_index)).min(axis=1)
+
+        self.ident_list = np.array(ident_list, dtype=np.int64)
+        self.agents = agents
+        self.matrix_idents = np.array(matrix, dtype=np.int64)
+
+        # Whether an agent of each world has reached a goal (World.goalEnd), and the number of frames each world has been advanced.
+        # A world stops being advanced once it has ended
+        self.goal_ends = np.array([world.goalEnd for world in worlds], dtype=bool)
+        self.frames = np.array([world.frames_created for world in worlds], dtype=np.int64)
+
+        # Worlds on which the object engine would have failed an assertion (or never finished a frame) are marked as failed and stop being advanced,
+        # so that they do not stop the other worlds
+        self.failed = np.zeros(self.num_worlds, dtype=bool)
+
+    ##########################################################################################################
+
+    @property
+    def goalEnd(self):
+        '''Whether an agent of the first world (the only one, when built from a single World) has reached a goal'''
+        return bool(self.goal_ends[0])
+
+    @property
+    def frames_created(self):
+        '''The number of frames the first world (the only one, when built from a single World) has been advanced'''
+        return int(self.frames[0])
+
+    ##########################################################################################################
+
+    def __neighbor_table(self, world):
+        '''
+        Returns the table of the hex next to each hex in each direction (-1 if there is none), for every world
+        :param world: a World to take the table of one world from (World.neighbor_table, whose cell ids are the same as in one world here)
+        '''
+
+        table = np.array(world.neighbor_table, dtype=np.int64)
+
+        # The same table for every world, offset to the hexes of that world
+        offsets = (np.arange(self.num_worlds) * self.world_cells)[:, None, None]
+        return np.where(table >= 0, table + offsets, -1).reshape(self.num_cells, 6)
+
+    ##########################################################################################################
+
+    def __add_idents(self, cells, states, serials, agents):
+        '''
+        Adds copies of idents to the arrays and returns their ids
+        :param cells: array of the hexes of the new idents
+        :param states: array of the states of the new idents
+        :param serials: array of the serial numbers of the new idents
+        :param agents: boolean array indicating which of the new idents have the "agent" property
+        '''
+
+        n = len(cells)
+        if self.num_idents + n > len(self.cell):
+            capacity = max(2 * len(self.cell), self.num_idents + n)
+            for name in ("cell", "state", "serial", "agent"):
+                array = getattr(self, name)
+                grown = np.zeros(capacity, dtype=array.dtype)
+                grown[:self.num_idents] = array[:self.num_idents]
+                setattr(self, name, grown)
+
+        ids = np.arange(self.num_idents, self.num_idents + n)
+        self.cell[ids] = cells
+        self.state[ids] = states
+        self.serial[ids] = serials
+        self.agent[ids] = agents
+        self.num_idents += n
+
+        return ids
+
+    def __add_ident(self, cell, state, serial, agent):
+        '''Adds a single ident to the arrays and returns its id'''
+        return int(self.__add_idents([cell], [state], [serial], [agent])[0])
+
+    def __copy_ident(self, ident, cell, state):
+        '''
+        Adds a copy of an ident with the given hex and state (as made by Ident.copy() and Ident.rotate_adopt()) and returns its id
+        :param ident: the id of the ident being copied
+        :param cell: the hex of the copy
+        :param state: the state of the copy
+        '''
+        return self.__add_ident(cell, state, self.serial[ident], self.agent[ident])
+
+    ##########################################################################################################
+
+    def __swap_agents(self, old, new):
+        '''
+        Replaces the agents in old by their copies in new (as done by World.swap_agents())
+        :param old: array of the ids of the idents which were copied
+        :param new: array of the ids of their copies
+        '''
+
+        if not self.agents or not len(old):
+            return
+
+        agents = np.array(self.agents, dtype=np.int64)
+        replacement = np.full(self.num_idents, -1, dtype=np.int64)
+        replacement[old] = new
+        self.agents = np.where(replacement[agents] >= 0, replacement[agents], agents).tolist()
+
+    ##########################################################################################################
+
+    def __direction_mask(self, idents):
+        '''
+        Returns an array holding, for each hex, the bitmask of the directions of the moving idents among idents which are in it
+        :param idents: array of ident ids
+        '''
+
+        states = self.state[idents]
+        moving = states >= 0
+
+        mask = np.zeros(self.num_cells, dtype=np.int64)
+        np.bitwise_or.at(mask, self.cell[idents[moving]], 1 << states[moving])
+
+        return mask
+
+    ##########################################################################################################
+
+    def update(self):
+        '''Advances every world which has neither ended nor failed by one frame (see World.update())'''
+
+        active = ~(self.goal_ends | self.failed)
+        if not active.any():
+            return
+
+        self.__set_aside(active)
+
+        self.__agents_act()
+
+        ident_list_new = self.__advance_or_flip()
+
+        self.__resolve_collisions(ident_list_new)
+
+        # Fix issues caused by moving idents backwards when moving idents collide with stationary idents and step back
+        self.__corrected_hexes = []
+        self.__corrected_idents = {}
+        checks = {}
+        while len(self.__double_check):
+            cell, ident = self.__double_check.pop()
+
+            world = cell // self.world_cells
+            if self.failed[world]:
+                continue
+
+            # The object engine can keep stepping idents back forever
+            checks[world] = checks.get(world, 0) + 1
+            if checks[world] > Array_World.MAX_DOUBLE_CHECKS_PER_HEX * self.world_cells:
+                self.failed[world] = True
+                continue
+
+            try:
+                self.__check_superimposition(cell, ident)
+            except (AssertionError, ValueError):
+                self.failed[world] = True
+
+        self.__finish_frame()
+
+        self.frames[active & ~self.failed] += 1
+
+    ##########################################################################################################
+
+    def run(self, max_frames):
+        '''
+        Advances the worlds until each of them has ended (an agent reached a goal) or failed, for at most max_frames frames.
+        Returns an array holding the number of frames each world took to end (-1 for the worlds which did not end)
+        :param max_frames: the maximum number of frames to advance the worlds by
+        '''
+
+        for _ in range(max_frames):
+            if (self.goal_ends | self.failed).all():
+                break
+            self.update()
+
+        return np.where(self.goal_ends, self.frames, -1)
+
+    ##########################################################################################################
+
+    def __set_aside(self, active):
+        '''
+        Sets aside the idents of the worlds which are not advanced this frame (they are put back by __finish_frame())
+        :param active: boolean array indicating which worlds are advanced
+        '''
+
+        if active.all():
+            self.__aside = None
+            return
+
+        agents = np.array(self.agents, dtype=np.int64)
+        lists = [self.ident_list, self.matrix_idents, agents]
+        advanced = [active[self.cell[idents] // self.world_cells] for idents in lists]
+
+        self.__aside = [idents[~keep] for idents, keep in zip(lists, advanced)]
+        self.ident_list, self.matrix_idents, agents = [idents[keep] for idents, keep in zip(lists, advanced)]
+        self.agents = agents.tolist()
+
+    ##########################################################################################################
+
+    def __agents_act(self):
+        '''Turns every moving agent towards its closest goal (see Ident.get_next_move())'''
+
+        if not self.agents:
+            return
+
+        agents = np.array(self.agents, dtype=np.int64)
+        worlds = self.cell[agents] // self.world_cells
+
+        # The object engine fails if an agent is not in the ident list
+        self.failed[worlds[~np.isin(agents, self.ident_list)]] = True
+
+        acting = (self.state[agents] >= 0) & self.has_goals[worlds]
+        agents = agents[acting]
+        states = self.state[agents]
+
+        # The forward, clockwise and counterclockwise neighbors of each agent (ties go to the first of them, as in Ident.find_next_move())
+        turns = np.array([0, 1, -1])
+        candidates = self.neighbors[self.cell[agents][:, None], (states[:, None] + turns) % 6]
+        self.failed[worlds[acting][~(candidates >= 0).any(axis=1)]] = True
+
+        distances = np.where(candidates >= 0, self.goal_distance[candidates], np.iinfo(np.int64).max)
+        self.state[agents] = (states + turns[np.argmin(distances, axis=1)]) % 6
+
+    ##########################################################################################################
+
+    def __advance_or_flip(self):
+        '''
+        Moves or flips every ident in the ident list (see Ident.advance_or_flip()).
+        Returns the array of the ids of the moved idents (World.ident_list_new)
+        '''
+
+        idents = self.ident_list
+        states = self.state[idents]
+        cells = self.cell[idents]
+
+        stationary = states < 0
+        dirs = np.where(stationary, 0, states)
+
+        def wall(offset):
+            neighbor = self.neighbors[cells, (dirs + offset) % 6]
+            return (neighbor >= 0) & self.kept_wall[neighbor] & ~stationary
+
+        wall_ahead, wall_clockwise, wall_counterclockwise = wall(0), wall(1), wall(-1)
+
+        new_states = states.copy()
+        new_cells = cells.copy()
+
+        # Bounce back off a wall ahead (or off two walls on either side)
+        flip = (wall_ahead & ~(wall_clockwise | wall_counterclockwise)) | (wall_clockwise & wall_counterclockwise)
+        rest = ~stationary & ~flip
+
+        # Bounce diagonally off a wall on one side
+        bounce_clockwise = rest & wall_counterclockwise
+        new_states[bounce_clockwise] = (states[bounce_clockwise] + 1) % 6
+        rest &= ~bounce_clockwise
+
+        bounce_counterclockwise = rest & wall_clockwise
+        new_states[bounce_counterclockwise] = (states[bounce_counterclockwise] - 1) % 6
+        rest &= ~bounce_counterclockwise
+
+        # Bounce back off an ident heading the opposite way in the hex ahead
+        ahead = self.neighbors[cells, dirs]
+        opposite = (dirs + 3) % 6
+        head_on = rest & (ahead >= 0) & ((self.__direction_mask(self.matrix_idents)[ahead] >> opposite) & 1).astype(bool)
+        flip |= head_on
+        rest &= ~head_on
+
+        new_states[flip] = (states[flip] + 3) % 6
+
+        # Advance all others (an ident with no hex ahead of it leaves the world)
+        new_cells[rest] = ahead[rest]
+        keep = ~(rest & (ahead < 0))
+
+        kept = idents[keep]
+        ident_list_new = self.__add_idents(new_cells[keep], new_states[keep], self.serial[kept], self.agent[kept])
+        self.__swap_agents(kept, ident_list_new)
+
+        return ident_list_new
+
+    ##########################################################################################################
+
+    def __resolve_collisions(self, ident_list_new):
+        '''
+        Writes the idents of the next frame from the moved idents (see Ident.resolve_collisions()).
+        Hexes which are alone or which only hold moving idents are resolved at once; the hexes reachable from collisions with stationary idents
+        are resolved one ident at a time, in the order of the ident list
+        :param ident_list_new: array of the ids of the moved idents
+        '''
+
+        cells = self.cell[ident_list_new]
+        states = self.state[ident_list_new]
+        stationary = states == -1
+
+        count = np.bincount(cells, minlength=self.num_cells)
+        has_stationary = np.bincount(cells, weights=stationary, minlength=self.num_cells) > 0
+        has_agent = np.bincount(cells, weights=self.agent[ident_list_new], minlength=self.num_cells) > 0
+        mask = self.__direction_mask(ident_list_new)
+        num_moving = np.bincount(cells, weights=~stationary, minlength=self.num_cells)
+        repeated_direction = Array_World.BIT_COUNTS[mask] != num_moving
+
+        # An agent reaching a goal ends the game (and the idents in its hex are not written)
+        goal_end = has_agent & self.goal_here
+        self.goal_ends[cells[goal_end[cells]] // self.world_cells] = True
+
+        # Collisions which depend on the order of the idents, and the hexes they can write to (the hex of origin and the two side neighbors of a moving ident)
+        ordered = (count[cells] > 1) & (has_stationary[cells] | repeated_direction[cells])
+        touched = np.zeros(self.num_cells, dtype=bool)
+        touched[cells[ordered]] = True
+        moving_ordered = ordered & ~stationary
+        reached = self.neighbors[cells[moving_ordered][:, None], (states[moving_ordered][:, None] + np.array([3, -2, 2])) % 6]
+        touched[reached[reached >= 0]] = True
+
+        sequential = touched[cells]
+        alone = count[cells] == 1
+
+        # Hexes reached by no order-dependent collision
+        write = ~sequential & ~goal_end[cells]
+        new_states = states.copy()
+
+        # A lone stationary ident is only written if nothing (ex. a wall or goalpost) is in its hex yet
+        write &= ~(alone & stationary & (self.kept_wall | self.kept_goal)[cells])
+
+        collide = write & ~alone
+        new_states[collide] = Array_World.MOVING_COLLISIONS[states[collide], mask[cells[collide]]]
+        self.failed[cells[new_states == Array_World.INVALID] // self.world_cells] = True
+
+        written = ident_list_new[write]
+        self.__fast_idents = self.__add_idents(cells[write], new_states[write], self.serial[written], self.agent[written])
+        self.__fast_keys = np.flatnonzero(write) * Array_World.KEY_STRIDE
+        self.__fast_listed = np.ones(len(self.__fast_idents), dtype=bool)
+
+        # The idents written at once, sorted by hex (for building the entry lists of the hexes)
+        fast_cells = self.cell[self.__fast_idents]
+        self.__fast_by_cell = np.argsort(fast_cells, kind="stable")
+        self.__fast_sorted_cells = fast_cells[self.__fast_by_cell]
+        self.__swap_agents(written, self.__fast_idents)
+
+        # The rest of the frame is written one ident at a time
+        self.__goal_end = goal_end
+        self.__hexes = {}
+        self.__hexes_new = {}
+        self.__listed = {}
+        self.__double_check = []
+
+        for cell in np.flatnonzero(touched).tolist():
+            self.__hex(cell)
+            self.__hexes_new[cell] = []
+
+        order = np.flatnonzero(sequential).tolist()
+        for index in order:
+            ident = int(ident_list_new[index])
+            self.__hexes_new[int(self.cell[ident])].append(ident)
+
+        for index in order:
+            ident = int(ident_list_new[index])
+
+            world = self.cell[ident] // self.world_cells
+            if self.failed[world]:
+                continue
+
+            self.__key = index * Array_World.KEY_STRIDE
+            try:
+                self.__resolve_in_order(ident)
+            except (AssertionError, ValueError):
+                self.failed[world] = True
+
+    ##########################################################################################################
+
+    def __hex(self, cell):
+        '''
+        Returns the list of the entries (ident ids, WALL_ENTRY or GOAL_ENTRY) in a hex of the matrix being written, in the order of Hex.idents.
+        The list is built the first time it is used (from the walls and goalposts kept in the hex and the idents written at once)
+        :param cell: the hex
+        '''
+
+        entries = self.__hexes.get(cell)
+
+        if entries is None:
+            entries = []
+            if self.kept_wall[cell]:
+                entries.append(Array_World.WALL_ENTRY)
+            if self.kept_goal[cell]:
+                entries.append(Array_World.GOAL_ENTRY)
+            start, end = np.searchsorted(self.__fast_sorted_cells, [cell, cell + 1])
+            entries.extend(self.__fast_idents[self.__fast_by_cell[start:end]].tolist())
+
+            self.__hexes[cell] = entries
+
+        return entries
+
+    def __entry_state(self, entry):
+        '''Returns the state of an entry of a hex (walls are -2 and goalposts are -1, as in the object engine)'''
+
+        if entry == Array_World.WALL_ENTRY:
+            return -2
+        if entry == Array_World.GOAL_ENTRY:
+            return -1
+        return int(self.state[entry])
+
+    def __first_with_state(self, entries, state):
+        '''Returns the first entry with the given state (as Hex.contains_direction()), or None'''
+        return next((entry for entry in entries if self.__entry_state(entry) == state), None)
+
+    def __remove_repeats(self, entries, serial):
+        '''
+        Removes the idents with the given serial number from a list of entries, as Ident.remove_repeats() does
+        '''
+        entries[:] = [entry for entry in entries if not (entry >= 0 and self.serial[entry] == serial)]
+
+    ##########################################################################################################
+
+    def __world_listed(self, world):
+        '''Returns the list of the [key, ident] pairs appended one at a time to the ident list being written in a world'''
+        return self.__listed.setdefault(int(world), [])
+
+    def __append_ident(self, ident):
+        '''Appends an ident to the ident list being written (after every ident already appended this frame)'''
+
+        self.__world_listed(self.cell[ident] // self.world_cells).append([self.__key, ident])
+        self.__key += 1
+
+    def __is_listed(self, entry):
+        '''Returns a boolean indicating if an entry of a hex is in the ident list being written'''
+        return entry >= 0 and any(listed[1] == entry for listed in self.__world_listed(self.cell[entry] // self.world_cells))
+
+    def __unlist(self, ident):
+        '''Removes an ident appended one at a time from the ident list being written'''
+
+        world_listed = self.__world_listed(self.cell[ident] // self.world_cells)
+        for i, listed in enumerate(world_listed):
+            if listed[1] == ident:
+                del world_listed[i]
+                return
+        raise ValueError("ident not in the ident list")
+
+    def __add_corrected(self, ident):
+        '''Appends an ident to the corrected idents of its world, after removing the idents with its serial number from them'''
+
+        corrected = self.__corrected_idents.setdefault(int(self.cell[ident] // self.world_cells), [])
+        self.__remove_repeats(corrected, self.serial[ident])
+        corrected.append(ident)
+
+    def __unlist_stationary(self, serial):
+        '''Removes the first stationary ident with the given serial number from the ident list being written, if there is one'''
+
+        fast = np.flatnonzero(self.__fast_listed & (self.__fast_keys < self.__key) & (self.serial[self.__fast_idents] == serial) & (self.state[self.__fast_idents] == -1))
+        fast_key = self.__fast_keys[fast[0]] if len(fast) else None
+
+        world_listed = self.__world_listed(serial % self.num_worlds)
+        index = next((i for i, listed in enumerate(world_listed) if (self.serial[listed[1]] == serial) and (self.state[listed[1]] == -1)), None)
+
+        if (index is not None) and ((fast_key is None) or (world_listed[index][0] < fast_key)):
+            del world_listed[index]
+        elif fast_key is not None:
+            self.__fast_listed[fast[0]] = False
+
+    ##########################################################################################################
+
+    def __rotate_adopt(self, ident, cell, state, entries=None, corrected=False, remove_repeats=True):
+        '''
+        Copies an ident into a hex with the given state and returns the copy (see Ident.rotate_adopt())
+        :param ident: the id of the ident being copied
+        :param cell: the hex of the copy
+        :param state: the state of the copy
+        :param entries: the list of entries the copy is added to (the hex of the matrix being written by default)
+        :param corrected: whether the copy goes to the corrected idents (instead of the ident list)
+        :param remove_repeats: whether to remove the idents with the same serial number from entries first (the object engine does not when a stationary ident stays put)
+        '''
+
+        copy = self.__copy_ident(ident, cell, state)
+
+        if corrected:
+            self.__add_corrected(copy)
+        else:
+            self.__append_ident(copy)
+
+        if entries is None:
+            entries = self.__hex(cell)
+        if remove_repeats:
+            self.__remove_repeats(entries, self.serial[copy])
+        entries.append(copy)
+
+        if ident in self.agents:
+            self.agents.remove(ident)
+            self.agents.append(copy)
+
+        return copy
+
+    ##########################################################################################################
+
+    @staticmethod
+    def __find_offset(state, other):
+        '''Returns the absolute value of the difference between two directions (see Ident.find_offset())'''
+
+        for i in range(5):
+            if ((state + i) % 6 == other) or ((state - i) % 6 == other):
+                return i
+
+    def __remove_pairs(self, hex_new, dir, directions):
+        '''Returns directions without the pairs of idents in hex_new which cancel out for an ident with state dir (see Ident.__remove_pairs())'''
+
+        directions = directions.copy()
+
+        if dir == -1:
+            pairs = [(0, 3), (1, 4), (2, 5)]
+        else:
+            pairs = [((dir + 1) % 6, (dir - 2) % 6), ((dir + 2) % 6, (dir - 1) % 6)]
+
+        for first, second in pairs:
+            first_ident = self.__first_with_state(hex_new, first)
+            second_ident = self.__first_with_state(hex_new, second)
+            if (first_ident is not None) and (second_ident is not None):
+                directions.remove(first_ident)
+                directions.remove(second_ident)
+
+        return directions
+
+    def __take_two(self, ident, cell, states):
+        '''Copies an ident which collided with two others with the given states, taking the state between them if they are at 120 degrees'''
+
+        if (states[0] + 2) % 6 == states[1]:
+            self.__rotate_adopt(ident, cell, (states[0] + 1) % 6)
+            return True
+        if (states[0] - 2) % 6 == states[1]:
+            self.__rotate_adopt(ident, cell, (states[0] - 1) % 6)
+            return True
+        return False
+
+    ##########################################################################################################
+
+    def __resolve_in_order(self, ident):
+        '''
+        Writes one moved ident into the next frame, exactly as Ident.resolve_collisions() does
+        :param ident: the id of the moved ident
+        '''
+
+        cell = int(self.cell[ident])
+        state = int(self.state[ident])
+
+        if self.__goal_end[cell]:
+            return
+
+        hex_new = self.__hexes_new[cell]
+        write_to = self.__hex(cell)
+
+        # If the ident is alone, copy it into the future
+        if len(hex_new) <= 1:
+            if (state != -1) or (len(write_to) == 0):
+                self.__rotate_adopt(ident, cell, state)
+            return
+
+        directions = [other for other in hex_new if self.serial[other] != self.serial[ident]]
+
+        # Moving idents only
+        if self.__first_with_state(hex_new, -1) is None:
+            directions = self.__remove_pairs(hex_new, state, directions)
+            states = [int(self.state[other]) for other in directions]
+
+            if len(states) == 0:
+                self.__rotate_adopt(ident, cell, (state + 3) % 6)
+            elif len(states) == 1:
+                self.__rotate_adopt(ident, cell, states[0])
+            else:
+                assert len(states) == 2
+                assert states[0] != states[1] and state not in states
+                if not self.__take_two(ident, cell, states):
+                    assert ((states[0] + 1) % 6 == states[1]) or ((states[0] - 1) % 6 == states[1])
+                    closer_to_dir_0 = (abs(state - states[0]) % 6) < (abs(state - states[1]) % 6)
+                    self.__rotate_adopt(ident, cell, states[1] if closer_to_dir_0 else states[0])
+
+        # A stationary ident hit by moving idents
+        elif state == -1:
+            directions = self.__remove_pairs(hex_new, state, directions)
+            states = [int(self.state[other]) for other in directions]
+
+            if len(states) == 0:
+                self.__rotate_adopt(ident, cell, state, remove_repeats=False)
+
+            elif len(states) == 1:
+                self.__rotate_adopt(ident, cell, states[0])
+
+            elif len(states) == 2:
+                if not self.__take_two(ident, cell, states):
+                    assert states[0] != -1 and states[1] != -1
+                    assert ((states[0] + 1) % 6 == states[1]) or ((states[0] - 1) % 6 == states[1])
+                    self.__rotate_adopt(ident, cell, states[1] if (states[0] - states[1]) % 6 > 2 else states[0])
+
+            elif len(states) == 3:
+                offset_0_1 = self.__find_offset(states[0], states[1])
+                offset_1_2 = self.__find_offset(states[1], states[2])
+                offset_0_2 = self.__find_offset(states[0], states[2])
+
+                # Symmetrical case: the stationary ident stays where it is
+                if offset_0_1 == 2 and offset_1_2 == 2:
+                    self.__rotate_adopt(ident, cell, state, remove_repeats=False)
+
+                # Adjacent case: the stationary ident is bumped in the direction of the middle ident
+                elif offset_0_1 == 1 and offset_0_2 == 1:
+                    self.__rotate_adopt(ident, cell, states[0])
+                elif offset_1_2 == 1 and offset_0_1 == 1:
+                    self.__rotate_adopt(ident, cell, states[1])
+                elif offset_0_2 == 1 and offset_1_2 == 1:
+                    self.__rotate_adopt(ident, cell, states[2])
+
+        # A moving ident hitting a stationary ident steps back into its hex of origin
+        else:
+            origin = int(self.neighbors[cell, (state + 3) % 6])
+            assert origin >= 0
+
+            # Bounce off an ident with the opposite state, or off two idents which sum to it
+            if (self.__first_with_state(hex_new, (state + 3) % 6) is not None) or ((self.__first_with_state(hex_new, (state + 2) % 6) is not None) and (self.__first_with_state(hex_new, (state + 4) % 6) is not None)):
+                copy = self.__rotate_adopt(ident, origin, (state + 3) % 6)
+                self.__double_check.append((origin, copy))
+
+            # Else become stationary, and push the stationary neighbors on either side of the hex which was hit
+            else:
+                copy = self.__rotate_adopt(ident, origin, -1)
+                self.__double_check.append((origin, copy))
+
+                self.__influence_neighbor(int(self.neighbors[cell, (state - 2) % 6]), (state - 1) % 6)
+                self.__influence_neighbor(int(self.neighbors[cell, (state + 2) % 6]), (state + 1) % 6)
+
+    ##########################################################################################################
+
+    def __influence_neighbor(self, cell, state):
+        '''
+        Makes a lone stationary ident in the given hex move with the given state (see the end of Ident.resolve_collisions())
+        :param cell: the neighboring hex (-1 if there is none)
+        :param state: the state the stationary ident takes
+        '''
+
+        if cell < 0:
+            return
+
+        hex_new = self.__hexes_new[cell]
+        ident_to_edit = self.__first_with_state(hex_new, -1)
+        if (ident_to_edit is None) or (len(hex_new) != 1):
+            return
+
+        to_become = self.__copy_ident(ident_to_edit, cell, state)
+
+        to_write_to = self.__hex(cell)
+        to_write_to.append(to_become)
+
+        # Remove the stationary ident (if it has already been written) from the ident list and the hex
+        self.__unlist_stationary(self.serial[to_become])
+        trouble = self.__first_with_state(to_write_to, -1)
+        if trouble is not None:
+            to_write_to.remove(trouble)
+        self.__append_ident(to_become)
+
+        # If the hex was pushed from both sides, combine the two pushes
+        if (len(to_write_to) == 2) and self.__is_listed(to_write_to[0]) and self.__is_listed(to_write_to[1]):
+            first, second = to_write_to
+            first_state, second_state = int(self.state[first]), int(self.state[second])
+
+            to_add = None
+            if first_state == (second_state + 3) % 6:
+                to_add = self.__copy_ident(first, self.cell[first], -1)
+            elif first_state == (second_state + 2) % 6:
+                to_add = self.__copy_ident(first, self.cell[first], (first_state - 1) % 6)
+            elif first_state == (second_state + 4) % 6:
+                to_add = self.__copy_ident(first, self.cell[first], (first_state + 1) % 6)
+
+            self.__unlist(first)
+            self.__unlist(second)
+            to_write_to.clear()
+            if to_add is not None:
+                to_write_to.append(to_add)
+                self.__append_ident(to_add)
+
+    ##########################################################################################################
+
+    def __check_superimposition(self, cell, ident_to_check):
+        '''
+        Resolves superimposed idents in a hex which an ident stepped back into (see Hex.check_superimposition())
+        :param cell: the hex
+        :param ident_to_check: the id of the ident which stepped back into the hex
+        '''
+
+        entries = self.__hex(cell)
+        assert len(entries)
+
+        if len(entries) == 1:
+            return
+
+        corrected_hex = []
+
+        # The moving idents in the hex, by direction
+        moving_idents = [None] * 6
+        for entry in entries:
+            if entry >= 0 and self.state[entry] >= 0:
+                moving_idents[self.state[entry]] = entry
+        condensed_list = [entry for entry in moving_idents if entry is not None]
+
+        def rotate_adopt(ident, state, cell=cell, entries=corrected_hex):
+            return self.__rotate_adopt(ident, cell, state, entries=entries, corrected=True)
+
+        def preserve(ident):
+            self.__remove_repeats(corrected_hex, self.serial[ident])
+            copy = self.__copy_ident(ident, self.cell[ident], self.state[ident])
+            corrected_hex.append(copy)
+            return copy
+
+        # A mix of stationary and moving idents
+        if self.__first_with_state(entries, -1) is not None:
+
+            if self.state[ident_to_check] == -1:
+                if len(condensed_list) != 1:
+                    return
+
+                # The moving ident steps back and becomes stationary, and the stationary ident takes its state
+                moving = condensed_list[0]
+                moving_state = int(self.state[moving])
+                origin = int(self.neighbors[self.cell[moving], (moving_state + 3) % 6])
+                assert origin >= 0
+                copy = rotate_adopt(moving, -1, cell=origin, entries=self.__hex(origin))
+                self.__double_check.append((origin, copy))
+
+                rotate_adopt(ident_to_check, moving_state)
+
+            else:
+                rotate_adopt(ident_to_check, (self.state[ident_to_check] + 3) % 6)
+
+        # Moving idents only
+        else:
+            state_to_check = self.state[ident_to_check]
+
+            # Opposite pairs bounce off one another if one of them is the ident being checked (otherwise they already have)
+            for i in range(3):
+                if (moving_idents[i] is not None) and (moving_idents[i + 3] is not None):
+                    if (i == state_to_check) or (i + 3 == state_to_check):
+                        rotate_adopt(moving_idents[i], (i + 3) % 6)
+                        rotate_adopt(moving_idents[i + 3], i)
+                    else:
+                        preserve(moving_idents[i])
+                        preserve(moving_idents[i + 3])
+
+                    moving_idents[i] = None
+                    moving_idents[i + 3] = None
+
+            condensed_list = [entry for entry in moving_idents if entry is not None]
+
+            if len(condensed_list) == 1:
+                copy = preserve(condensed_list[0])
+                self.__add_corrected(copy)
+
+            elif len(condensed_list) == 3:
+                states = [int(self.state[entry]) for entry in condensed_list]
+
+                # At 120 degrees to one another: all bounce back
+                if (self.__find_offset(states[0], states[1]) == 2) and (self.__find_offset(states[0], states[2]) == 2):
+                    for entry, state in zip(condensed_list, states):
+                        rotate_adopt(entry, (state + 3) % 6)
+
+                # At 60 degrees to one another: the two on the sides swap states and the one in the middle stays the same
+                else:
+                    for i in range(6):
+                        if (moving_idents[i] is not None) and (moving_idents[(i + 1) % 6] is not None) and (moving_idents[(i + 2) % 6] is not None):
+                            rotate_adopt(moving_idents[i], self.state[moving_idents[(i + 2) % 6]])
+                            rotate_adopt(moving_idents[(i + 2) % 6], self.state[moving_idents[i]])
+
+                            middle_copy = preserve(moving_idents[(i + 1) % 6])
+                            self.__add_corrected(middle_copy)
+
+            else:
+                assert len(condensed_list) == 2
+                first, second = condensed_list
+                first_state, second_state = self.state[first], self.state[second]
+                rotate_adopt(first, second_state)
+                rotate_adopt(second, first_state)
+
+        self.__corrected_hexes.append((cell, corrected_hex))
+
+    ##########################################################################################################
+
+    def __finish_frame(self):
+        '''Substitutes in the corrected hexes and idents, and drops the copies of idents which are no longer used'''
+
+        for cell, corrected_hex in self.__corrected_hexes:
+            self.__hexes[cell] = corrected_hex
+
+        # The ident list, in the order it was written, with the idents of each world kept together
+        listed = [listed for world_listed in self.__listed.values() for listed in world_listed]
+        listed_keys = np.array([listed[0] for listed in listed], dtype=np.int64)
+        listed_idents = np.array([listed[1] for listed in listed], dtype=np.int64)
+        keys = np.concatenate([self.__fast_keys[self.__fast_listed], listed_keys])
+        ident_list = np.concatenate([self.__fast_idents[self.__fast_listed], listed_idents])[np.argsort(keys, kind="stable")]
+        ident_list = self.__by_world(ident_list)
+
+        # Corrected idents replace the idents with their serial numbers at the end of the list of their world
+        if self.__corrected_idents:
+            corrected = np.array([ident for world_corrected in self.__corrected_idents.values() for ident in world_corrected], dtype=np.int64)
+            ident_list = ident_list[self.__unrepeated(ident_list, self.serial[corrected].tolist())]
+            ident_list = self.__by_world(np.concatenate([ident_list, corrected]))
+
+        agents = np.array(self.agents, dtype=np.int64)
+
+        # The idents in the hexes: those written at once (in hexes without entry lists) and those in the entry lists
+        in_listed_hex = np.zeros(self.num_cells, dtype=bool)
+        in_listed_hex[list(self.__hexes.keys())] = True
+        matrix = [self.__fast_idents[~in_listed_hex[self.cell[self.__fast_idents]]]]
+        for cell, entries in self.__hexes.items():
+            matrix.append(np.array([entry for entry in entries if entry >= 0], dtype=np.int64))
+            self.kept_wall[cell] = Array_World.WALL_ENTRY in entries
+            self.kept_goal[cell] = Array_World.GOAL_ENTRY in entries
+        matrix = np.concatenate(matrix)
+
+        # Put back the worlds which were not advanced
+        if self.__aside is not None:
+            ident_list, matrix, agents = [np.concatenate([idents, aside]) for idents, aside in zip((ident_list, matrix, agents), self.__aside)]
+
+        # Keep only the idents still in the list, the hexes or the agents
+        used = np.unique(np.concatenate([ident_list, matrix, agents]))
+        new_id = np.full(self.num_idents, -1, dtype=np.int64)
+        new_id[used] = np.arange(len(used))
+        for name in ("cell", "state", "serial", "agent"):
+            array = getattr(self, name)
+            array[:len(used)] = array[used]
+        self.num_idents = len(used)
+
+        self.ident_list = new_id[ident_list]
+        self.matrix_idents = new_id[matrix]
+        self.agents = new_id[agents].tolist()
+
+        self.__hexes = self.__hexes_new = None
+        self.__listed = self.__double_check = self.__corrected_hexes = self.__corrected_idents = self.__aside = None
+
+    def __by_world(self, idents):
+        '''Returns an array of ident ids sorted by world, keeping the order of the idents of each world'''
+        return idents[np.argsort(self.cell[idents] // self.world_cells, kind="stable")]
+
+    def __unrepeated(self, ident_list, serials):
+        '''
+        Returns a boolean array indicating which idents of ident_list are left after removing the idents with any of the serial numbers,
+        as Ident.remove_repeats() does
+        :param ident_list: array of ident ids
+        :param serials: the list of serial numbers to remove
+        '''
+        return np.logical_not(np.isin(self.serial[ident_list], serials))
+
+    ##########################################################################################################
+
+    def frame(self, world=0):
+        '''
+        Returns the idents of the current frame of a world as a sorted list of (serial number, matrix index, list index, state) tuples (see World.frame())
+        :param world: the index of the world (in the list the Array_World was built from)
+        '''
+
+        idents = self.ident_list[self.cell[self.ident_list] // self.world_cells == world]
+        cells = self.cell[idents] - world * self.world_cells
+        return sorted(zip((self.serial[idents] // self.num_worlds).tolist(), (cells // self.cols).tolist(), (cells % self.cols).tolist(), self.state[idents].tolist()))
+
+##############################################################################################################
+
+# Ident.MOVING_COLLISIONS, with INVALID where the object engine fails an assertion
+Array_World.MOVING_COLLISIONS = np.array([[Array_World.INVALID if state is None else state for state in row] for row in Ident.MOVING_COLLISIONS], dtype=np.int64)
+
+##############################################################################################################
+
+def cross_check(world, num_frames):
+    '''
+    Advances a World with World.update() and an Array_World copy of it with Array_World.update(), comparing their frames.
+    Returns the number of the first frame on which the engines differ, or None if they produce the same frames
+    (for num_frames frames, or until an agent reaches a goal). The object engine failing on a frame only agrees with the world being marked as failed
+    :param world: the World to advance (it is changed)
+    :param num_frames: the maximum number of frames to compare
+    '''
+
+    engine = Array_World(world)
+
+    for frame in range(1, num_frames + 1):
+        # The object engine prints as it goes
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                world.update()
+        except Exception:
+            engine.update()
+            return None if engine.failed[0] else frame
+
+        engine.update()
+        if engine.failed[0]:
+            return frame
+
+        if (world.frame() != engine.frame()) or (world.goalEnd != engine.goalEnd):
+            return frame
+
+        if world.goalEnd:
+            break
+
+    return None
+
+##############################################################################################################
@@ -0,0 +1,193 @@
+import numpy as np
+
+##############################################################################################################
+
+class DFA:
+
+    # Static variable to track number of DFAs created (gives each DFA a cheap, unique representation)
+    dfas_created = 0
+
+    # Value used to pad encoded words of different lengths into one matrix
+    PAD = -1
+
+    ##########################################################################################################
+
+    def __init__(self, table, alphabet):
+        '''
+        DFA constructor
+        :param table: a 2D int array in which the rows are the states; the first column is the accept bit (0 or 1) of the state
+                      and the remaining columns are the states which the corresponding symbol of the alphabet points to
+        :param alphabet: the Alphabet the DFA is using (the ids of its symbols are the columns of table, offset by one)
+        '''
+
+        self.table = np.asarray(table, dtype=np.int32)
+
+        assert self.table.ndim == 2
+        assert self.table.shape[1] == len(alphabet) + 1
+
+        self.alphabet = alphabet
+
+        # Python-list copy of the table, built the first time a single word is run through the DFA
+        self.__rows = None
+
+        self.serial_number = DFA.dfas_created
+        DFA.dfas_created += 1
+
+    ##########################################################################################################
+
+    @classmethod
+    def from_file(cls, file_path, alphabet):
+        '''
+        Reads a DFA written by write_to_file() (one row per line, entries separated by spaces)
+        :param file_path: the path of the text file holding the DFA
+        :param alphabet: the alphabet the DFA is using
+        '''
+
+        with open(file_path, "r") as dfa_file:
+            rows = [[int(entry) for entry in line.split()] for line in dfa_file if line.strip()]
+
+        return cls(rows, alphabet)
+
+    ##########################################################################################################
+
+    def write_to_file(self, file_path):
+        '''
+        Writes the DFA to a text file, one row per line with entries separated by spaces
+        :param file_path: the path of the text file to write to
+        '''
+
+        with open(file_path, "w") as dfa_file:
+            dfa_file.write("\n".join(" ".join(str(entry) for entry in row) for row in self.table.tolist()))
+
+    ##########################################################################################################
+
+    def __len__(self):
+        '''Returns the number of states in the DFA'''
+        return self.table.shape[0]
+
+    def __repr__(self):
+        '''Returns a short string naming the DFA (used in place of the whole table when the DFA is part of a cache key)'''
+        return f"DFA {self.serial_number} ({len(self)} states)"
+
+    ##########################################################################################################
+
+    def is_accepting(self, state):
+        '''
+        Returns a boolean indicating if the given state is an accept state
+        :param state: int, the index of the state
+        '''
+        return bool(self.table[state, 0])
+
+    ##########################################################################################################
+
+    @staticmethod
+    def pad_words(words):
+        '''
+        Packs a list of words (sequences of symbol ids) into a matrix of symbol ids, one word per row (padded with DFA.PAD), and an array of word lengths
+        :param words: the list of words being packed
+        '''
+
+        lengths = np.fromiter((len(word) for word in words), dtype=np.int64, count=len(words))
+
+        matrix = np.full((len(words), int(lengths.max()) if len(words) else 0), DFA.PAD, dtype=np.int32)
+        for i, word in enumerate(words):
+            matrix[i, :len(word)] = word
+
+        return matrix, lengths
+
+    ##########################################################################################################
+
+    def run(self, word):
+        '''
+        Returns the index of the state in which the DFA ends after reading the word, starting at state 0
+        :param word: the word (sequence of symbol ids) being run through the DFA
+        '''
+
+        if self.__rows is None:
+            self.__rows = self.table.tolist()
+        rows = self.__rows
+
+        state = 0
+        for symbol in word:
+            state = rows[state][symbol + 1]
+
+        return state
+
+    ##########################################################################################################
+
+    def accepts(self, word):
+        '''
+        Returns a boolean indicating if the DFA accepts the word
+        :param word: the word (sequence of symbol ids) being run through the DFA
+        '''
+        return self.is_accepting(self.run(word))
+
+    ##########################################################################################################
+
+    def run_encoded(self, matrix, lengths):
+        '''
+        Runs many padded words through the DFA at once, one symbol position at a time.
+        Returns an array holding the final state of each word
+        :param matrix: 2D array of symbol ids, one word per row (padded with DFA.PAD)
+        :param lengths: array holding the number of symbols in each word
+        '''
+
+        states = np.zeros(matrix.shape[0], dtype=np.int32)
+
+        for position in range(matrix.shape[1]):
+            # Only advance the words which are still being read
+            active = lengths > position
+            states[active] = self.table[states[active], matrix[active, position] + 1]
+
+        return states
+
+    ##########################################################################################################
+
+    def run_many(self, words):
+        '''
+        Returns an array holding the final state of each word in words
+        :param words: the list of words (sequences of symbol ids) being run through the DFA
+        '''
+        return self.run_encoded(*DFA.pad_words(words))
+
+    ##########################################################################################################
+
+    def accepts_many(self, words):
+        '''
+        Returns a boolean array indicating which of the words the DFA accepts
+        :param words: the list of words (sequences of symbol ids) being run through the DFA
+        '''
+        return self.table[self.run_many(words), 0].astype(bool)
+
+##############################################################################################################
+
+class Hypothesis(DFA):
+
+    ##########################################################################################################
+
+    def __init__(self, table, alphabet, access_strings):
+        '''
+        Hypothesis constructor: a DFA built by the learner (M_hat), which also knows the access string of each of its states.
+        Running words through a Hypothesis only walks its table; it never asks the Teacher
+        :param table: the table of the DFA (see DFA)
+        :param alphabet: the alphabet the DFA is using
+        :param access_strings: the access string of each state, in the same order as the rows of table
+        '''
+
+        super().__init__(table, alphabet)
+
+        assert len(access_strings) == len(self)
+
+        # Copy the access strings, as the learner keeps adding states to its own list
+        self.access_strings = list(access_strings)
+
+    ##########################################################################################################
+
+    def access_string(self, word):
+        '''
+        Returns the access string of the state in which the hypothesis ends after reading the word
+        :param word: the word (sequence of symbol ids) being run through the hypothesis
+        '''
+        return self.access_strings[self.run(word)]
+
+##############################################################################################################
@@ -1,7 +1,9 @@
 import time
 import copy
+import collections
 import os
-import pygame
+
+# NOTE: pygame is only imported by the methods which draw or run the world, so that the world can be used headless (ex. by the Teacher) without it
 
 '''
 Process of the game:
@@ -20,9 +22,13 @@ class Ident:
     # Static variable to track number of Idents created
     idents_created = 0
 
+    # MOVING_COLLISIONS[s][mask] is the state taken by an ident with state s in a hex holding one ident for each direction in the bitmask mask
+    # (or None where resolve_collisions() fails an assertion). Filled in below the class (see _moving_collision_table())
+    MOVING_COLLISIONS = None
+
     ##########################################################################################################
     
-    def __init__(self, matrix_index, list_index, world, color=(255, 255, 255), state: int = -1, serial_number = -1, hist = None, property = None):
+    def __init__(self, matrix_index, list_index, world, color=(255, 255, 255), state: int = -1, serial_number = -1, property = None):
         '''
         Ident constructor
         :param matrix_index: an int representing the index of the list in the world.hex_matrix in which the Ident is located
@@ -31,18 +37,14 @@ class Ident:
         :param color: the color of the Ident
         :param state: an int representing the state (wall, stationary, or direction) of the Ident
         :param serial_number: int serial number (to check against accidental cloning)
-        :param hist: the history of the ident (for backstepping)
         :param property: a string representing the special property of the ident, if any (ex. "goal")
         '''
 
 
-        if hist is None:
-            hist = []
         self.color = color
 
         self.state : int = state
 
-        self.hist = hist
         if serial_number == -1:
             # If no serial number is provided
             self.serial_number = Ident.idents_created
@@ -76,58 +78,24 @@ class Ident:
 
     def __get_neighbor(self, matrix, dir):
         '''
-        Returns the neighboring hex in the given direction in the given matrix.
+        Returns the neighboring hex in the given direction in the given matrix (looked up in the world's neighbor table).
         If that hex does not exist, returns None
         :param matrix: the hex matrix that includes the ident
         :param dir: an int representing the direction of interest
         '''
-        
-        if dir == 0:
-            # print("neighbor 0")
-            try:
-                return matrix[self.matrix_index][self.list_index - 1]
-            except:
-                return None
-            
-        elif dir == 1:
-            # print("neighbor 1")
-            try:
-                return matrix[self.matrix_index + 1][self.list_index - 1]  
-            except:
-                return None
-
-        elif dir == 2:
-            # print("neighbor 2")
-            try:
-                return matrix[self.matrix_index + 1][self.list_index]
-            except:
-                return None
-
-        elif dir == 3:
-            # print("neighbor 3")
-            try:
-                return matrix[self.matrix_index][self.list_index + 1]
-            except:
-                return None
-
-        elif dir == 4:
-            # print("neighbor 4")
-            try:
-                return matrix[self.matrix_index - 1][self.list_index + 1]
-            except:
-                return None
-            
-        elif dir == 5:
-            # print("neighbor 5")
-            try:
-                return matrix[self.matrix_index - 1][self.list_index]
-            except:
-                return None
-            
-        else:
+
+        if dir not in (0, 1, 2, 3, 4, 5):
             print("Invalid direction " + str(dir) + " passed to Ident.__get_neighbor(dir)")
             return None
-        
+
+        w = self.world
+        neighbor = w.neighbor_table[self.matrix_index * w.num_cols + self.list_index][dir]
+        if neighbor < 0:
+            return None
+
+        matrix_index, list_index = w.cell_indices[neighbor]
+        return matrix[matrix_index][list_index]
+
     ##########################################################################################################
 
     def remove_repeats(self, id_list):
@@ -135,9 +103,11 @@ class Ident:
         Finds the ident(s) with the same serial number as self in the passed list and removes them from list
         :param id_list: the list of Idents from which repeats should be removed
         '''
-        for ident in id_list:
-            if ident.serial_number == self.serial_number:
-                id_list.remove(ident)
+        serial_number = self.serial_number
+        # The list is rebuilt rather than removed from while going through it (which would skip the ident following each one removed)
+        kept = [ident for ident in id_list if ident.serial_number != serial_number]
+        if len(kept) != len(id_list):
+            id_list[:] = kept
 
 
     ##########################################################################################################
@@ -222,7 +192,7 @@ class Ident:
         hex = w.hex_matrix_new[self.matrix_index][self.list_index]
 
         if (hex.contains_property("agent")):
-            maybe_goal = next((Ident for Ident in w.goals if (Ident.matrix_index == self.matrix_index) and (Ident.list_index == self.list_index)), None)
+            maybe_goal = w.goal_at(self.matrix_index, self.list_index)
             # find the first ident in goals with matching grid positions to self
             # if it exists, close da game!!!
             if maybe_goal is not None:
@@ -257,6 +227,14 @@ class Ident:
 
         
         if not hex.contains_stationary():
+            # With a single ident for each direction (and no other copy of self), look the state to take up from the directions in the hex
+            directions_mask = hex.idents.mask & Hex_Idents.DIRECTIONS
+            if (len(directions) == len(hex.idents) - 1) and (Hex_Idents.DIRECTION_COUNTS[directions_mask] == len(hex.idents)):
+                dir_final = Ident.MOVING_COLLISIONS[dir][directions_mask]
+                if dir_final is not None:
+                    self.rotate_adopt(write_to_hex, w.ident_list, dir_final = dir_final)
+                    return
+
             # if we contain opposite pairs, remove them from the directions list
             directions = self.__remove_pairs(hex, dir, directions)
             
@@ -408,7 +386,7 @@ class Ident:
                 
                 # If two idents that sum to the opposite state are present, bounce off
                 elif hex.contains_direction((dir + 2) % 6) and hex.contains_direction((dir + 4) % 6):
-                    modified_copy = self.rotate_adopt([hex_of_origin, w.ident_list])
+                    modified_copy = self.rotate_adopt(hex_of_origin, w.ident_list)
                     
                     # Save hex and ident to double-check for superimposed idents
                     w.double_check.append([hex_of_origin, modified_copy])
@@ -499,6 +477,7 @@ class Ident:
                             print("RIGHT testing ident length...")
                             if(len(to_write_to.idents) == 2) and (to_write_to.idents[0] in w.ident_list) and (to_write_to.idents[1] in w.ident_list):
                                 print("RIGHT CALL: Overlapping influences on stationary hex!!!")
+                                to_add = None
                                 if to_write_to.idents[0].state == (to_write_to.idents[1].state + 3) % 6:
                                     # they are opposites, keep the hex stationary
                                     to_add = to_write_to.idents[0].__copy()
@@ -535,12 +514,13 @@ class Ident:
         # Default value
         if neighbor_index == None:
             neighbor_index = self.state
-        try:
-            return self.__get_neighbor(self.world.hex_matrix, neighbor_index).contains_direction(neighbor_state)
-        except:
-            print("Neighbor DNE")
+
+        neighbor = self.__get_neighbor(self.world.hex_matrix, neighbor_index)
+        if neighbor is None:
             return None
 
+        return neighbor.contains_direction(neighbor_state)
+
     ##########################################################################################################
 
     def __neighbor_is_wall(self, neighbor_index_offset=0):
@@ -582,7 +562,7 @@ class Ident:
         ident.matrix_index = future_hex.matrix_index
         ident.list_index = future_hex.list_index
 
-        if future_ident_list == self.world.corrected_idents:
+        if future_ident_list is self.world.corrected_idents:
             # Don't double-up on idents with the same serial number in the corrected list
             ident.remove_repeats(future_ident_list)
 
@@ -624,9 +604,14 @@ class Ident:
 
             return
 
+        # Walls in the forward, clockwise and counterclockwise neighbors
+        wall_ahead = self.__neighbor_is_wall()
+        wall_right = self.__neighbor_is_wall(1)
+        wall_left = self.__neighbor_is_wall(-1)
+
         # If need to bounce head-on off of a wall, then bounce and return
-        head_on_wall = self.__neighbor_is_wall() and not (self.__neighbor_is_wall(1) or self.__neighbor_is_wall(-1))
-        double_adjacent_wall = self.__neighbor_is_wall(1) and self.__neighbor_is_wall(-1)
+        head_on_wall = wall_ahead and not (wall_right or wall_left)
+        double_adjacent_wall = wall_right and wall_left
         if head_on_wall or double_adjacent_wall:
             
             self.rotate_adopt(future_hex, future_list)
@@ -635,13 +620,13 @@ class Ident:
 
 
         # If need to bounce diagonally off of a wall, then bounce and return
-        if self.__neighbor_is_wall(-1):
+        if wall_left:
             self.rotate_adopt(future_hex, future_list, dir_offset=1)
 
             return
         
         # Other diagonal wall bounce case
-        if self.__neighbor_is_wall(1):
+        if wall_right:
             self.rotate_adopt(future_hex, future_list, dir_offset=-1)
 
             return
@@ -667,36 +652,11 @@ class Ident:
                 self.world.swap_agents(self, copy_to_move)
 
 
-    ##########################################################################################################
-
-    def visited(self, m, l):
-        '''
-        Marks ident as visited
-        :param m: int, matrix_index
-        :param l: int, list_index
-        '''
-        # push onto stack history
-        # pushed onto the history is
-            # hex matrix index
-            # hex list index
-            # current state
-
-        # note, we want to keep up to 5 past states at a time
-        # to change amount, just change limit #
-        limit = 5
-
-        if len(self.hist) == limit + 1:
-            self.hist.pop(0)
-        
-        
-        self.hist.append((m, l, self.state))
-
-
     ##########################################################################################################
 
     def __copy(self):
         '''Copies and returns self'''
-        new_copy = Ident(self.matrix_index, self.list_index, self.world, color = self.color, state = self.state, serial_number = self.serial_number, hist = self.hist.copy(), property = self.property, agent=self.agent)
+        new_copy = Ident(self.matrix_index, self.list_index, self.world, color = self.color, state = self.state, serial_number = self.serial_number, property = self.property)
         return new_copy
     
 
@@ -708,10 +668,11 @@ class Ident:
 
     ###############################################################################################################
 
-    def backstep(self):
-        '''Reverts self to its state and location from one frame prior'''
-
-        past = self.hist.pop()
+    def backstep(self, past):
+        '''
+        Reverts self to its state and location from one frame prior
+        :param past: (matrix index, list index, state) tuple of self one frame prior (from the world's history)
+        '''
 
         # first we change the state to the state it was at that point in time
         self.state = past[2]
@@ -725,22 +686,13 @@ class Ident:
 
     def find_closest_goal(self, hex_test):
         '''
-        Finds and returns the goal closest to self
+        Finds and returns the distance to the goal closest to hex_test (read from the world's goal distance field, see World.goal_distance())
         :param hex_test: the Hex relative to which distance is calculated (the Hex self is in)
         '''
 
         assert type(hex_test) is Hex
 
-        goals = self.world.goals
-        goal_distances = {}
-        for goal in goals:
-            dist = World.axial_distance(goal, hex_test)
-            goal_distances[goal] = dist
-
-        # return goal corresponding to minimum distance in the dictionary
-        min_value = min(goal_distances.values())
-
-        return min_value
+        return self.world.goal_distance(hex_test)
 
 
     @staticmethod
@@ -799,7 +751,6 @@ class Ident:
         assert agent in agent.world.ident_list
 
         w = agent.world
-        my_index = w.agents.index(agent)
 
         influence = Ident.find_next_move(agent)
 
@@ -809,8 +760,232 @@ class Ident:
             agent.state += influence
             agent.state %= 6
 
+            # The agent is already in its hex, so update that hex's bitmask
+            w.hex_matrix[agent.matrix_index][agent.list_index].idents.restate(agent)
+
+
+
+###############################################################################################################
+
+def _moving_collision_table():
+    '''
+    Builds Ident.MOVING_COLLISIONS, the outcome of resolve_collisions() for a moving ident in a hex with no stationary idents and one ident per direction:
+    other idents in opposite pairs cancel out (as in __remove_pairs()), and the ident takes the state of what is left
+    '''
+
+    table = [[None] * 64 for s in range(6)]
+
+    for mask in range(64):
+        for s in range(6):
+            if not (mask >> s) & 1:
+                continue
+
+            def present(direction):
+                return bool((mask >> (direction % 6)) & 1)
+
+            # Remove the pairs of other idents which cancel out
+            others = [d for d in range(6) if present(d) and d != s]
+            if present(s + 1) and present(s - 2):
+                others = [d for d in others if d not in ((s + 1) % 6, (s - 2) % 6)]
+            if present(s + 2) and present(s - 1):
+                others = [d for d in others if d not in ((s + 2) % 6, (s - 1) % 6)]
+
+            # Nothing left: bounce back
+            if len(others) == 0:
+                table[s][mask] = (s + 3) % 6
+            elif len(others) == 1:
+                table[s][mask] = others[0]
+            elif len(others) == 2:
+                d0, d1 = others
+                # At 120 degrees to each other: take the direction in between
+                if (d0 + 2) % 6 == d1:
+                    table[s][mask] = (d0 + 1) % 6
+                elif (d0 - 2) % 6 == d1:
+                    table[s][mask] = (d0 - 1) % 6
+                # At 60 degrees to each other: take the state of the one further away (by the same measure as resolve_collisions(), which never ties)
+                elif ((d0 + 1) % 6 == d1) or ((d0 - 1) % 6 == d1):
+                    table[s][mask] = d1 if (abs(s - d0) % 6) < (abs(s - d1) % 6) else d0
+
+    return table
+
+Ident.MOVING_COLLISIONS = _moving_collision_table()
+
+###############################################################################################################
+
+class Hex_Idents(list):
+    '''
+    The list of idents in a hex, which keeps a bitmask of what they are: a bit for each direction (0 through 5), and bits for stationary idents,
+    walls, goals and agents. The bitmask is updated as idents are added and removed, so that Hex can check for them without going through the list.
+    NOTE: The state and property of an ident must be set before it is added to a hex (or the hex told of the change with restate())
+    '''
+
+    # Bits of the bitmask
+    DIRECTIONS = (1 << 6) - 1
+    STATIONARY = 1 << 6
+    WALL = 1 << 7
+    GOAL = 1 << 8
+    AGENT = 1 << 9
+
+    # Bit for any other state or property (so that only an empty hex has an empty bitmask)
+    OTHER = 1 << 10
+
+    # Bit for each state and property
+    STATE_BITS = {0: 1, 1: 1 << 1, 2: 1 << 2, 3: 1 << 3, 4: 1 << 4, 5: 1 << 5, -1: STATIONARY, -2: WALL}
+    PROPERTY_BITS = {"goal": GOAL, "agent": AGENT}
+
+    # Number of directions in each bitmask of directions
+    DIRECTION_COUNTS = [bin(mask).count("1") for mask in range(64)]
+
+    def __init__(self, idents=()):
+        '''
+        Hex_Idents constructor
+        :param idents: the idents initially in the list
+        '''
+        list.__init__(self, idents)
+        self.__remask()
+
+    ##########################################################################################################
+
+    def __remask(self):
+        '''Rebuilds the bitmask from the idents in the list (after some were removed, as a hex only ever holds a few idents)'''
+
+        mask = 0
+        for ident in self:
+            mask |= Hex_Idents.STATE_BITS.get(ident.state, Hex_Idents.OTHER)
+            if ident.property is not None:
+                mask |= Hex_Idents.PROPERTY_BITS.get(ident.property, Hex_Idents.OTHER)
+        self.mask = mask
+
+    def restate(self, ident):
+        '''
+        Updates the bitmask after the state of an ident already in the list has changed
+        :param ident: the Ident whose state changed (nothing is done if it is not in the list)
+        '''
+
+        if any(listed is ident for listed in self):
+            self.__remask()
+
+    ##########################################################################################################
+
+    def append(self, ident):
+        list.append(self, ident)
+        self.mask |= Hex_Idents.STATE_BITS.get(ident.state, Hex_Idents.OTHER)
+        if ident.property is not None:
+            self.mask |= Hex_Idents.PROPERTY_BITS.get(ident.property, Hex_Idents.OTHER)
+
+    def extend(self, idents):
+        list.extend(self, idents)
+        self.__remask()
+
+    def __iadd__(self, idents):
+        self.extend(idents)
+        return self
+
+    def insert(self, index, ident):
+        list.insert(self, index, ident)
+        self.__remask()
+
+    def remove(self, ident):
+        list.remove(self, ident)
+        self.__remask()
+
+    def pop(self, index=-1):
+        ident = list.pop(self, index)
+        self.__remask()
+        return ident
+
+    def clear(self):
+        list.clear(self)
+        self.mask = 0
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self.__remask()
+
+    def __setitem__(self, index, idents):
+        list.__setitem__(self, index, idents)
+        self.__remask()
+
+    def __reduce__(self):
+        # The idents and the bitmask are restored together by __setstate__() (the idents may not be fully unpickled yet, as they refer back to their world)
+        return (Hex_Idents, (), {"idents": list(self), "mask": self.mask})
+
+    def __setstate__(self, state):
+        list.extend(self, state["idents"])
+        self.mask = state["mask"]
+
+###############################################################################################################
+
+class Goal_List(list):
+    '''
+    The list of goals of a world, which counts the changes made to it, so that the world can tell whether its goal distance field
+    (see World.goal_distance()) is still for the goals in the list without going through them.
+    NOTE: A goal must not be moved while it is in the list (remove it and add it back instead)
+    '''
+
+    def __init__(self, goals=()):
+        '''
+        Goal_List constructor
+        :param goals: the goals initially in the list
+        '''
+        list.__init__(self, goals)
+        self.version = 0
+
+    ##########################################################################################################
+
+    def append(self, goal):
+        list.append(self, goal)
+        self.version += 1
+
+    def extend(self, goals):
+        list.extend(self, goals)
+        self.version += 1
+
+    def __iadd__(self, goals):
+        self.extend(goals)
+        return self
+
+    def insert(self, index, goal):
+        list.insert(self, index, goal)
+        self.version += 1
+
+    def remove(self, goal):
+        list.remove(self, goal)
+        self.version += 1
+
+    def pop(self, index=-1):
+        goal = list.pop(self, index)
+        self.version += 1
+        return goal
+
+    def clear(self):
+        list.clear(self)
+        self.version += 1
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self.version += 1
+
+    def reverse(self):
+        list.reverse(self)
+        self.version += 1
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self.version += 1
+
+    def __setitem__(self, index, goals):
+        list.__setitem__(self, index, goals)
+        self.version += 1
+
+    def __reduce__(self):
+        # The goals and the count are restored together by __setstate__() (the goals may not be fully unpickled yet, as they refer back to their world)
+        return (Goal_List, (), {"goals": list(self), "version": self.version})
+
+    def __setstate__(self, state):
+        list.extend(self, state["goals"])
+        self.version = state["version"]
 
-    
 ###############################################################################################################
 
 # hex class is just for graphics/displaying the board/storing idents
@@ -856,38 +1031,54 @@ class Hex:
         self.list_index = list_index
 
         # Store relevant idents
-        self.idents = []
+        self.idents = Hex_Idents()
 
         # Map matrix_index and list_index to Cartesian coordinates
         self.x = 60*matrix_index - 20
         self.y = 35*matrix_index + 70*list_index - 490
 
-        self.coordinates = Hex.__create_coor(self.x, self.y)
-
-       
-        # Create arrows for later use
-        #pivot is the center of the hexagon
-        pivot = pygame.Vector2(self.x + 20, self.y + 35)
-        # set of arrow points should be the vectors from the pivot to the edge points of the arrow
-        arrow = [(0, -15), (10, -5), (5, -5), (5, 15), (-5, 15), (-5, -5), (-10, -5)]
-        # get arrow by adding all the vectors to the pivot point => allows for easy rotation
-        self.arrows = []
-        for i in range(6):
-            self.arrows.append([(pygame.math.Vector2(x, y)).rotate(60.0*i) + pivot for x, y in arrow]) 
-    
-        # Coordinates used to draw smaller hexagon later if the hex becomes stationary
-        self.small_hexagon = [(self.x+9, self.y+11), (self.x+31, self.y+11), (self.x+47, self.y+35), (self.x+31, self.y+59), (self.x+9, self.y+59), (self.x-7, self.y+35)]
+        # Drawing geometry (the hexagon, the smaller hexagon and the arrows), built the first time the hex is drawn
+        self.__coordinates = None
+        self.__small_hexagon = None
+        self.__arrows = None
+
+    ##########################################################################################################
+
+    @property
+    def coordinates(self):
+        '''The 6 coordinates defining the hexagon (built the first time they are used)'''
+        if self.__coordinates is None:
+            self.__coordinates = Hex.__create_coor(self.x, self.y)
+        return self.__coordinates
+
+    @property
+    def small_hexagon(self):
+        '''Coordinates used to draw smaller hexagon if the hex becomes stationary (built the first time they are used)'''
+        if self.__small_hexagon is None:
+            self.__small_hexagon = [(self.x+9, self.y+11), (self.x+31, self.y+11), (self.x+47, self.y+35), (self.x+31, self.y+59), (self.x+9, self.y+59), (self.x-7, self.y+35)]
+        return self.__small_hexagon
+
+    @property
+    def arrows(self):
+        '''The arrow drawn on the hex for each direction (built the first time they are used, as they need pygame)'''
+        if self.__arrows is None:
+            import pygame
+
+            #pivot is the center of the hexagon
+            pivot = pygame.Vector2(self.x + 20, self.y + 35)
+            # set of arrow points should be the vectors from the pivot to the edge points of the arrow
+            arrow = [(0, -15), (10, -5), (5, -5), (5, 15), (-5, 15), (-5, -5), (-10, -5)]
+            # get arrow by adding all the vectors to the pivot point => allows for easy rotation
+            self.__arrows = []
+            for i in range(6):
+                self.__arrows.append([(pygame.math.Vector2(x, y)).rotate(60.0*i) + pivot for x, y in arrow])
+        return self.__arrows
+
     ##########################################################################################################
 
     def is_moving(self):
         '''Returns a boolean indicating if the given hex contains any moving idents'''
-
-        for ident in self.idents:
-            if ident.state >= 0:
-            # if (ident.state != -1) and (ident.state != -2):
-                return True
-        
-        return False
+        return bool(self.idents.mask & Hex_Idents.DIRECTIONS)
     
     ##########################################################################################################
 
@@ -903,7 +1094,7 @@ class Hex:
     def make_goal(self, world, list_to_append):
         '''Gives the designated hex a goalpost identity'''
 
-        goal_ident = Ident(self.matrix_index, self.list_index, world, color = (247, 173, 45), state = -1, serial_number = -1, hist = None, property = "goal")
+        goal_ident = Ident(self.matrix_index, self.list_index, world, color = (247, 173, 45), state = -1, serial_number = -1, property = "goal")
         self.idents.append(goal_ident)
         list_to_append.append(goal_ident)
 
@@ -916,6 +1107,11 @@ class Hex:
         :param prop: string, the property for which to check
         NOTE: This could cause bugs if a hex contains multiple idents with the same property
         '''
+
+        # The bitmask tells if there is none (a property without a bit is looked for in any non-empty hex)
+        if not self.idents.mask & Hex_Idents.PROPERTY_BITS.get(prop, -1):
+            return None
+
         for ident in self.idents:
             if ident.property == prop:
                 return ident
@@ -931,6 +1127,10 @@ class Hex:
         NOTE: This could cause bugs if a hex contains multiple idents with the same direction
         '''
 
+        # The bitmask tells if there is none (a state without a bit is looked for in any non-empty hex)
+        if not self.idents.mask & Hex_Idents.STATE_BITS.get(dir, -1):
+            return None
+
         for ident in self.idents:
             if ident.state == dir:
                 return ident
@@ -1089,7 +1289,7 @@ class Hex:
                             corrected_hex.idents.append(middle_copy)
 
                             # Don't double-up on idents with the same serial number in the corrected list
-                            my_copy.remove_repeats(world.corrected_idents)
+                            middle_copy.remove_repeats(world.corrected_idents)
 
                             world.corrected_idents.append(middle_copy)
             
@@ -1113,6 +1313,8 @@ class Hex:
         Graphics (drawing hexes and the corresponding idents)
         :param screen: surface on which to draw
         '''
+
+        import pygame
             
         color_to_draw = Hex.DEFAULT_COLOR
 
@@ -1152,6 +1354,12 @@ class Hex:
 # while loop for running game goes in World
 class World:
 
+    # (matrix index, list index) offset of the neighboring hex in each direction (see Ident.get_neighbor())
+    NEIGHBOR_OFFSETS = [(0, -1), (1, -1), (1, 0), (0, 1), (-1, 1), (-1, 0)]
+
+    # Number of past frames kept in the history (for backstepping)
+    HISTORY_DEPTH = 6
+
     def __init__(self, automatic_walls=True, display_window=True):
         '''
         World constructor
@@ -1163,14 +1371,16 @@ class World:
 
         self.frames_created = 0
 
-        pygame.init()
-
         SCREEN_WIDTH = 800
 
         SCREEN_HEIGHT = 600
 
         # NOTE: If the user is poorly-behaved (says they don't want to display but later does), this will cause issues due to the lack of self.screen
+        # pygame is only imported and initialized for a world with a window (a headless world never uses it)
         if display_window:
+            import pygame
+            pygame.init()
+
             self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
             pygame.display.set_caption("Hex Simulator")
 
@@ -1196,6 +1406,23 @@ class World:
                 myHex = Hex(x, y)
                 hex_list_new.append(myHex)
 
+        # Set up neighbor table: neighbor_table[cell][dir] is the cell next to the given cell in direction dir, or -1 if it is off the matrix
+        # (the hex at matrix_index, list_index is cell matrix_index * num_cols + list_index, and cell_indices[cell] is (matrix_index, list_index))
+        self.num_cols = len(self.hex_matrix[0])
+        self.cell_indices = []
+        self.neighbor_table = []
+
+        for x in range(len(self.hex_matrix)):
+            for y in range(self.num_cols):
+                self.cell_indices.append((x, y))
+                neighbors = []
+                for d_x, d_y in World.NEIGHBOR_OFFSETS:
+                    if (0 <= x + d_x < len(self.hex_matrix)) and (0 <= y + d_y < self.num_cols):
+                        neighbors.append((x + d_x) * self.num_cols + y + d_y)
+                    else:
+                        neighbors.append(-1)
+                self.neighbor_table.append(neighbors)
+
         # Set up ident list
         self.ident_list = []
 
@@ -1205,6 +1432,10 @@ class World:
         # Set up wall list
         self.wall_list = []
 
+        # Set up history: a snapshot of the idents at the start of each of the last HISTORY_DEPTH frames, as a dict of
+        # serial number -> (matrix index, list index, state), the oldest of which is dropped as each new one is pushed
+        self.history = collections.deque(maxlen=World.HISTORY_DEPTH)
+
         # Set up list of hex-ident pairs to double-check and lists to store the corrections
         self.double_check = []
         self.corrected_hexes = []
@@ -1213,8 +1444,20 @@ class World:
         # Default agent to None (will be assigned a value in __read_line if one exists)
         self.agents = []
 
-        # set up goalpost list
+        # set up goalpost list (a Goal_List, see the goals property)
         self.goals = []
+
+        # Distance from each hex to the closest goal (None until it is first needed), the hexes it has been filled in for, and the goal cells it is for (see goal_distance())
+        self.goal_distances = [[None] * len(hex_list) for hex_list in self.hex_matrix]
+        self.__filled_cells = []
+        self.__goal_field_cells = []
+
+        # The Goal_List and the version of it that the distances are for (so that they are only checked against the goals once the goals change)
+        self.__goal_field_goals = None
+        self.__goal_field_version = -1
+
+        # Index in self.goals of the first goal in each goal cell, for the same goal cells as the distances (None until it is first needed, see goal_at())
+        self.__goal_positions = None
         
         # Create walls around the edges, if requested
         if automatic_walls:
@@ -1248,12 +1491,97 @@ class World:
     def axial_distance(a : Hex, b : Hex):
         '''Method for determining the axial hex distance between two hexes in a hex world'''
 
-        vec = World.axial_subtract(a, b)
-        return (abs(vec.matrix_index)
-            + abs(vec.matrix_index + vec.list_index)
-            + abs(vec.list_index)) / 2
+        # Subtract the coordinates directly instead of building a Hex with axial_subtract()
+        d_matrix_index = a.matrix_index - b.matrix_index
+        d_list_index = a.list_index - b.list_index
+        return (abs(d_matrix_index)
+            + abs(d_matrix_index + d_list_index)
+            + abs(d_list_index)) / 2
     
     ##########################################################################################################
+
+    @property
+    def goals(self):
+        '''The goals of the world, as a Goal_List (a plain list assigned to goals is turned into one)'''
+        return self.__goals
+
+    @goals.setter
+    def goals(self, goals):
+        self.__goals = goals if isinstance(goals, Goal_List) else Goal_List(goals)
+
+    ##########################################################################################################
+
+    def goal_distance(self, hex):
+        '''
+        Returns the axial distance (see axial_distance()) from a hex to the closest goal (there must be at least one).
+        The distance is kept in self.goal_distances, so that it is only computed again once the goals change
+        :param hex: the Hex of interest
+        '''
+
+        goals = self.__goals
+        if (goals is not self.__goal_field_goals) or (goals.version != self.__goal_field_version):
+            self.__update_goal_distances()
+
+        distance = self.goal_distances[hex.matrix_index][hex.list_index]
+        if distance is None:
+            # Twice the axial distance is always even
+            distance = min(abs(goal_mi - hex.matrix_index) + abs(goal_mi - hex.matrix_index + goal_li - hex.list_index) + abs(goal_li - hex.list_index)
+                for goal_mi, goal_li in self.__goal_field_cells) // 2
+            self.goal_distances[hex.matrix_index][hex.list_index] = distance
+            self.__filled_cells.append((hex.matrix_index, hex.list_index))
+
+        return distance
+
+    def goal_at(self, matrix_index, list_index):
+        '''
+        Returns the first goal in self.goals in the given hex, or None if there is none
+        :param matrix_index: int, the matrix index of the hex
+        :param list_index: int, the list index of the hex
+        '''
+
+        goals = self.__goals
+        if (goals is not self.__goal_field_goals) or (goals.version != self.__goal_field_version):
+            self.__update_goal_distances()
+
+        if self.__goal_positions is None:
+            # The goal cells are in the order of self.goals, so the same goal cells always index the same positions
+            self.__goal_positions = {}
+            for position, cell in enumerate(self.__goal_field_cells):
+                self.__goal_positions.setdefault(cell, position)
+
+        position = self.__goal_positions.get((matrix_index, list_index))
+        return None if position is None else self.goals[position]
+
+    def __update_goal_distances(self):
+        '''
+        Brings self.goal_distances (and the goal cell index used by goal_at()) up to date with the cells of the goals in self.goals, after the goals
+        were changed or replaced. Added goals only lower the distances filled in so far, while removing (or moving) a goal empties them
+        '''
+
+        self.__goal_field_goals = self.__goals
+        self.__goal_field_version = self.__goals.version
+
+        # (a replaced list may well hold goals in the same cells)
+        goal_cells = [(goal.matrix_index, goal.list_index) for goal in self.goals]
+        if goal_cells == self.__goal_field_cells:
+            return
+
+        old_cells = set(self.__goal_field_cells)
+
+        if old_cells - set(goal_cells):
+            for matrix_index, list_index in self.__filled_cells:
+                self.goal_distances[matrix_index][list_index] = None
+            self.__filled_cells.clear()
+        else:
+            added = [(goal_mi, goal_li) for goal_mi, goal_li in goal_cells if (goal_mi, goal_li) not in old_cells]
+            for matrix_index, list_index in self.__filled_cells:
+                self.goal_distances[matrix_index][list_index] = min([self.goal_distances[matrix_index][list_index]]
+                    + [(abs(goal_mi - matrix_index) + abs(goal_mi - matrix_index + goal_li - list_index) + abs(goal_li - list_index)) // 2 for goal_mi, goal_li in added])
+
+        self.__goal_field_cells = goal_cells
+        self.__goal_positions = None
+
+    ##########################################################################################################
     
     def swap_agents(self, agent_to_remove, agent_to_append):
         '''
@@ -1321,15 +1649,9 @@ class World:
         self.corrected_hexes.clear()
         self.corrected_idents.clear()
 
-        # Push history of idents, walls, and goals
-        for ident in self.ident_list:
-            ident.visited(ident.matrix_index, ident.list_index)
-        
-        for wall in self.wall_list:
-            wall.visited(wall.matrix_index, wall.list_index)
-
-        for goal in self.goals:
-            goal.visited(goal.matrix_index, goal.list_index)
+        # Push a snapshot of the idents onto the history (walls and goals never move, so they are left out)
+        # The idents are gone through backwards so that the first ident with each serial number is the one kept
+        self.history.append({ident.serial_number: (ident.matrix_index, ident.list_index, ident.state) for ident in reversed(self.ident_list)})
         
         # Agents act
         for agent in self.agents:
@@ -1341,6 +1663,10 @@ class World:
         # Clear the new matrix and list so that advance_or_flip can write to it
         for hex_list in self.hex_matrix_new:
             for hex in hex_list:
+                # Nothing to clear in an empty hex
+                if not hex.idents:
+                    continue
+
                 # Save wall_ident to add back in, if applicable
                 wall_ident = hex.contains_direction(-2)
                 # also save and add back in goalposts
@@ -1363,6 +1689,10 @@ class World:
         # Clear the current matrix and list so that resolve_collisions can write to it
         for hex_list in self.hex_matrix:
             for hex in hex_list:
+                # Nothing to clear in an empty hex
+                if not hex.idents:
+                    continue
+
                 # Save wall_ident to add back in, if applicable
                 wall_ident = hex.contains_direction(-2)
                 # also save and add back in goalposts
@@ -1408,13 +1738,20 @@ class World:
 
     ##########################################################################################################
 
+    def frame(self):
+        '''Returns the idents of the current frame as a sorted list of (serial number, matrix index, list index, state) tuples (used to cross-check Array_World)'''
+        return sorted((ident.serial_number, ident.matrix_index, ident.list_index, ident.state) for ident in self.ident_list)
+
+    ##########################################################################################################
+
     def __backstep(self):
         '''Reverts every hex to how it was one state back.'''
-        # Each ident holds its own history of the past 5 steps at any given time.
+        # The world holds a snapshot of its idents for each of the past HISTORY_DEPTH steps at any given time.
         # Because the code is deterministic, the next step will be re-calculated the same way.
         
         # Only take any steps if there is history left to be shown
-        if (len(self.ident_list) > 0) and (len(self.ident_list[0].hist) > 0):
+        if (len(self.ident_list) > 0) and (len(self.history) > 0):
+            past = self.history.pop()
         
             # First, clear the matrix and list
             for hex_list in self.hex_matrix:
@@ -1436,7 +1773,9 @@ class World:
             # Then, apply step back on all idents
             # After applying the step back, return those idents to the list in their respective hexes
             for ident in self.ident_list:
-                ident.backstep()
+                # (an ident added since the snapshot stays where it is)
+                if ident.serial_number in past:
+                    ident.backstep(past[ident.serial_number])
 
                 self.hex_matrix[ident.matrix_index][ident.list_index].idents.append(ident)
               
@@ -1463,6 +1802,8 @@ class World:
 
     def run(self):
         '''Runs simulation'''
+
+        import pygame
         
         run = True
 
@@ -1518,7 +1859,7 @@ class World:
                 self.update()
             elif state == "hyper":
                 dt = clock.tick(20) / 1000
-                self.__update()
+                self.update()
         
         # Exit
         if(self.goalEnd):
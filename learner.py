@@ -1,4 +1,6 @@
 from teacher import Teacher
+from dfa import DFA, Hypothesis
+from alphabet import Alphabet
 
 import itertools as it
 import matplotlib.pyplot as plt
@@ -6,22 +8,8 @@ from movement_teacher import Movement_Teacher
 from direction_teacher import Direction_Teacher
 
 import time
-import functools
 import networkx as nx
-
-##############################################################################################################
-    
-def memoize(obj):
-    '''memoize method and information from https://wiki.python.org/moin/PythonDecoratorLibrary#Memoize'''
-    cache = obj.cache = {}
-
-    @functools.wraps(obj)
-    def memoizer(*args, **kwargs):
-        key = str(args) + str(kwargs)
-        if key not in cache:
-            cache[key] = obj(*args, **kwargs)
-        return cache[key]
-    return memoizer
+import numpy as np
 
 ##############################################################################################################
 
@@ -40,20 +28,20 @@ class Learner:
 
         accepting = []
 
-        for row in self.m_hat:
+        for index, row in enumerate(self.m_hat.table.tolist()):
             # create node with label from the index, and add it to the list of accepted nodes if row[0] is 1
 
-            access_string = next(key for key in self.access_string_reference.keys() if self.access_string_reference[key] == self.m_hat.index(row))
+            access_string = self.alphabet.decode(self.states.access_string_of(index))
             print(access_string)
 
-            m_graph.add_node(self.m_hat.index(row), data=access_string)
+            m_graph.add_node(index, data=access_string)
             if row[0] == 1:
-                accepting.append(self.m_hat.index(row))
+                accepting.append(index)
 
             # edge from node "row index" to node "row[i]" where it is labelled by the character in language[i]
             for i in range(1, len(row)):
                 print(self.alphabet[i-1])
-                m_graph.add_edge(self.m_hat.index(row), row[i], key = self.alphabet[i - 1], data = self.alphabet[i-1])
+                m_graph.add_edge(index, row[i], key = self.alphabet[i - 1], data = self.alphabet[i-1])
 
         # draw the graph
 
@@ -82,11 +70,11 @@ class Learner:
     
     ##########################################################################################################
 
-    def __init__(self, mem_per_eq=100, alphabet = ['0','1'], teacher_type=-1, num_states = -1, seed = -1, premade_dfa = None, display_graphs = False, accuracy_checks=False, wb=None, test_id = None):
+    def __init__(self, mem_per_eq=100, alphabet = ['0','1'], teacher_type=-1, num_states = -1, seed = -1, premade_dfa = None, display_graphs = False, accuracy_checks=False, wb=None, test_id = None, binary_search = False, processes = 1, chunksize = None, epsilon = None, delta = None):
         '''
         Initializes the learner
         :param mem_per_eq: the number of equivalence queries performed during a single membership query by the teacher associated with this learner
-        :param alphabet: the alphabet the DFA is using (defaults to binary) (assumed to be in List form otherwise)
+        :param alphabet: the alphabet the DFA is using (defaults to binary), as an Alphabet or a list of symbols
         :param teacher_type: used if there is a specific subclass of teacher associated with this learner
         :param num_states: number of states to be created in a randomly generated DFA for the teacher
         :param seed: seed to be used for a randomly generated teacher DFA if applicable
@@ -95,11 +83,19 @@ class Learner:
         :param accuracy_checks: boolean value for if accuracy checks should be performed after every iteration through the main L-Star loop
         :param wb: workbook in Excel that data should be written to IF APPLICABLE if accuracy checks are performed
         :param test_id: this is for labeling the Excel files as well (differing between Sheets within the Workbook)
+        :param binary_search: boolean value for if counterexamples should be processed with a binary search (Rivest-Schapire) instead of a linear scan of their prefixes
+        :param processes: the number of worker processes the teacher uses to answer batches of membership queries
+        :param chunksize: the number of membership queries the teacher sends to a worker process at a time
+        :param epsilon: the error allowed in the learned DFA, for PAC equivalence queries (used with delta instead of mem_per_eq)
+        :param delta: the probability allowed of the learned DFA having more than epsilon error, for PAC equivalence queries
         '''
                 
         self.solved = False
-        # Intialize alphabet
-        self.alphabet = alphabet
+
+        # Whether to process counterexamples with a binary search or a linear scan
+        self.binary_search = binary_search
+        # Intialize alphabet (words are tuples of the ids of its symbols)
+        self.alphabet = alphabet if isinstance(alphabet, Alphabet) else Alphabet(alphabet)
 
         # Whether or not to draw the graphs
         self.graphs = display_graphs
@@ -131,11 +127,13 @@ class Learner:
 
         # Initialize teacher
 
-        # If a premade DFA was provided (for testing), use it
-        if premade_dfa:
-            assert len(premade_dfa[0]) == len(alphabet) + 1
+        # If a premade DFA was provided (for testing), use it (a table is turned into a DFA first, as the Teacher accepts either)
+        if (premade_dfa is not None) and len(premade_dfa) > 0:
+            if not isinstance(premade_dfa, DFA):
+                premade_dfa = DFA(premade_dfa, self.alphabet)
+            assert premade_dfa.table.shape[1] == len(self.alphabet) + 1
 
-            self.my_teacher = Teacher(self.alphabet, mem_per_eq, premade_dfa = premade_dfa)
+            self.my_teacher = Teacher(self.alphabet, mem_per_eq, premade_dfa = premade_dfa, processes = processes, chunksize = chunksize, epsilon = epsilon, delta = delta)
 
         
         # Else the DFA to be learned will be constructed by the teacher
@@ -143,9 +141,9 @@ class Learner:
             if teacher_type == -1:
                 self.my_teacher = Teacher(self.alphabet, mem_per_eq, num_states = num_states, seed = seed)
             elif teacher_type == 0:
-                self.my_teacher = Movement_Teacher(self.alphabet, mem_per_eq, seed = seed)
+                self.my_teacher = Movement_Teacher(self.alphabet, mem_per_eq, seed = seed, processes = processes, chunksize = chunksize, epsilon = epsilon, delta = delta)
             elif teacher_type == 1:
-                self.my_teacher = Direction_Teacher(self.alphabet, mem_per_eq, seed = seed)
+                self.my_teacher = Direction_Teacher(self.alphabet, mem_per_eq, seed = seed, processes = processes, chunksize = chunksize, epsilon = epsilon, delta = delta)
             else:
                 exit("Error: Invalid teacher type")
 
@@ -154,9 +152,7 @@ class Learner:
         self.init_t_m_hat()
 
         # Confirm that all -1s with which M_hat was initialized have been overwritten
-        for row in self.m_hat:
-            for entry in row:
-                assert entry >= 0
+        assert (self.m_hat.table >= 0).all()
         
     ##########################################################################################################
 
@@ -167,23 +163,29 @@ class Learner:
         '''
 
         # initialize T with just the empty string (lambda)
-        self.t = Tree(Node("", None, 0))
+        self.t = Tree(Node((), None, 0))
+
+        # dictionary for storing each string sifted through T as a key corresponding to the node in T at which its sift ended
+        self.sift_cache = {}
 
         # create M_hat with just one state in T
         # The DFA (M) is a matrix in which the rows are the nodes
         # The first entry in each row is a boolean in int form (0 or 1) indicating whether the node is an accept (1) or reject (0) state
         # The remaining entries in each row are the numbers of the nodes which the corresponding alphabet value at that index points to
-        self.m_hat = []
 
-        # dictionary for storing access strings as keys corresponding to their rows in the m_hat matrix
-        # add to the dictionary when updating the tree, not when reconstructing m_hat, because we need dict to construct m_hat
-        self.access_string_reference = {}
-        self.update_dictionary("", 0)
+        # registry of the states: each access string with its row in the m_hat matrix and its leaf in T
+        # add to the registry when updating the tree, not when reconstructing m_hat, because we need the registry to construct m_hat
+        self.states = State_Registry()
+        self.states.add((), self.t.root)
+
+        # The access strings of the leaf split by the last call to update_tree and of the leaf created by that split
+        # (None until T changes after M_hat has been constructed from it, in which case M_hat must be constructed from scratch)
+        self.last_split = None
 
         # Create the first state (with the empty access string)
         # check whether empty string is accepted or rejected
         to_append = []
-        if self.my_teacher.member(""):
+        if self.my_teacher.member(()):
             # empty string accepted
             to_append.append(1)
         else:
@@ -193,8 +195,8 @@ class Learner:
         for i in range(len(self.alphabet)):
             to_append.append(0)
 
-        # Append the first state to M_hat        
-        self.m_hat.append(to_append)
+        # M_hat has only the first state
+        self.m_hat = Hypothesis([to_append], self.alphabet, self.states.access_strings)
 
         # draw m_hat graph here, as m_hat is not updated in initialization past this point
         if self.graphs:
@@ -211,38 +213,23 @@ class Learner:
         # Else put counterexample gamma into our tree T
         else:
 
-            assert type(gamma) is str
+            assert type(gamma) is tuple
+
+            empty_leaf = Node((), self.t.root, 1)
+            gamma_leaf = Node(gamma, self.t.root, 1)
 
             # determine if the counterexample is a member of teacher DFA M
             if self.my_teacher.member(gamma):
-                self.t.root.right_child = Node(gamma, self.t.root, 1)
-                self.t.root.left_child = Node("", self.t.root, 1)
+                self.t.root.right_child = gamma_leaf
+                self.t.root.left_child = empty_leaf
             else:
                 # counterexample is rejected
-                self.t.root.right_child = Node("", self.t.root, 1)
-                self.t.root.left_child = Node(gamma, self.t.root, 1)
+                self.t.root.right_child = empty_leaf
+                self.t.root.left_child = gamma_leaf
             
-            # Add counterexample to the dictionary
-            self.update_dictionary(gamma, 1)
-
-    ##########################################################################################################
-
-
-    def update_dictionary(self, key : str, index : int):
-        '''
-        updates the variable access_string_reference (dictionary) with the given values
-        :param key: the key in the key,value pair being added to the dictionary
-        :param index: the value in the key value pair, which represnts the index in the matrix of the acess string being added
-        '''
-
-        # Print debugging information if trying to clobber a pre-existing key:
-        if key in self.access_string_reference.keys():
-            print("Error: Trying to clobber key " + key)
-            self.__sift(key)
-            #exit(1)
-            assert not key in self.access_string_reference.keys()
-
-        self.access_string_reference.update({key : index})
+            # The root is no longer the leaf of the empty string; add counterexample to the registry
+            self.states.move_leaf((), empty_leaf)
+            self.states.add(gamma, gamma_leaf)
 
     ##########################################################################################################
 
@@ -265,9 +252,9 @@ class Learner:
 
             if gamma:
                 # if a counterexample is provided, update T by determining the new access string and distinguishing string (sift down)
-                assert(self.my_teacher.member(gamma) != self.my_teacher.member(gamma, self.m_hat, self.alphabet))
+                assert(self.my_teacher.member(gamma) != self.m_hat.accepts(gamma))
 
-                assert type(gamma) is str
+                assert type(gamma) is tuple
 
                 # call update_tree (includes updating dictionary)
                 self.update_tree(gamma)
@@ -289,10 +276,14 @@ class Learner:
         # If we have exited the loop, we have solved the DFA
         print("DFA solved!")
         print(f"Learned DFA with {len(self.m_hat)} states:")
-        for i in range(len(self.m_hat)):
-            print(self.m_hat[i])
+        for row in self.m_hat.table.tolist():
+            print(row)
         print("with tree:")
-        self.t.print_tree()
+        self.t.print_tree(self.alphabet)
+
+        print(f"Membership queries asked of the teacher: {self.my_teacher.membership_queries}")
+        answers = self.my_teacher.answers
+        print(f"Membership cache: {answers.hits} hits, {answers.misses} misses, {answers.evictions} evictions")
         
         print("End L-Star algorithm")
         return self.m_hat
@@ -305,15 +296,12 @@ class Learner:
         # Assert that the teacher belongs to one of the subclasses
         assert isinstance(self.my_teacher, (Movement_Teacher, Direction_Teacher))
         
-        # A variable to tally the number of correct results
-        success_tally = 0
-
         total_queries = 500
-        for i in range(0, total_queries):
-            test_string = self.my_teacher.generate_string()
+        test_strings = self.my_teacher.generate_words(total_queries)
 
-            if self.my_teacher.member(test_string) == self.my_teacher.member(test_string, self.m_hat):
-                success_tally += 1
+        # Run all of the test strings through M_Hat at once and tally the number of correct results
+        expected = np.array(self.my_teacher.member_batch(test_strings))
+        success_tally = int(np.count_nonzero(expected == self.m_hat.accepts_many(test_strings)))
 
         return success_tally/total_queries
 
@@ -326,11 +314,10 @@ class Learner:
         '''
 
         # Get the tree nodes corresponding to the two passed access strings
-        # NOTE: We could also have passed n1 instead of s1 to this method, but we would need to sift for s2 (which comes from M_hat) regardless
 
-        assert s1 in self.access_string_reference.keys() and s2 in self.access_string_reference.keys()
-        n1 = memoize(self.__sift_return_node(s1))
-        n2 = memoize(self.__sift_return_node(s2))
+        assert s1 in self.states and s2 in self.states
+        n1 = self.states.leaf_of(self.states.state_of(s1))
+        n2 = self.states.leaf_of(self.states.state_of(s2))
 
         # Travel up the tree until you've found the point in n1 and n2's family trees when they are on the same level
         while n1.level > n2.level:
@@ -365,32 +352,40 @@ class Learner:
         '''
 
         # Assert that gamma really is a counterexample
-        assert bool(self.my_teacher.member(gamma)) != bool(self.my_teacher.member(gamma, self.m_hat, self.alphabet))
+        assert bool(self.my_teacher.member(gamma)) != self.m_hat.accepts(gamma)
+
+        # Find the leaf to split, the new access string and the new distinguishing string
+        if self.binary_search:
+            node_to_edit, new_access_string, new_d = self.__binary_search_decomposition(gamma)
+        else:
+            node_to_edit, new_access_string, new_d = self.__linear_decomposition(gamma)
 
+        self.__split_leaf(node_to_edit, new_access_string, new_d)
+
+    ##########################################################################################################
+
+    def __linear_decomposition(self, gamma):
+        '''
+        Finds the first prefix of the counterexample gamma for which sifting and running the prefix through M_hat lead to different states.
+        Returns the leaf in T to split, the new access string, and the new distinguishing string
+        :param gamma: counterexample provided by equivalence query
+        '''
 
         j = 0
         mismatch_found = False
-        # for each prefix set of characters of gamma
+        # for each prefix set of characters (3-char symbols) of gamma
         for i in range(len(gamma)):
             j = i
 
             # Get the first i letters of gamma
-            strng = gamma[0 : 3*(i + 1)]
+            strng = gamma[0 : i + 1]
             # sift gamma[i] in T
-            if strng in self.access_string_reference.keys():
-                node_sift = memoize(self.__sift_return_node(strng))
-            else:
-                node_sift = self.__sift_return_node(strng)
+            node_sift = self.__sift_return_node(strng)
             access_string_sift = node_sift.value
-            loop_d = node_sift.parent.value if node_sift.parent else ""
 
-            # Accessing dictionary key from value according to these instructions: https://www.geeksforgeeks.org/python-get-key-from-value-in-dictionary/#
-            row_in_m_hat = self.m_hat.index(Teacher.final_state(strng, self.m_hat, self.alphabet))
-            my_dict = self.access_string_reference
-            access_string_m_hat = list(my_dict.keys())[list(my_dict.values()).index(row_in_m_hat)]
+            access_string_m_hat = self.m_hat.access_string(strng)
             
             # Repeat loop until sifting and running the truncated string through M_hat lead to distinct states (different access strings/row indices in M_hat)
-            #if self.access_string_reference[access_string] != self.m_hat.index(Teacher.final_state(strng, self.m_hat, self.alphabet)):
             if access_string_sift != access_string_m_hat:
                 mismatch_found = True
                 break
@@ -402,100 +397,175 @@ class Learner:
         lca = self.__get_lca(access_string_sift, access_string_m_hat)
 
         # let j be the least i such that s[i] does not equal s_hat[i]
-        gamma_j_minus_1 = gamma[0 : 3*j]
+        gamma_j_minus_1 = gamma[0 : j]
+        assert(gamma_j_minus_1 != ())
 
-        # Update dictionary with access string
-        assert(gamma_j_minus_1 != "")
-        self.update_dictionary(gamma_j_minus_1, len(self.access_string_reference))
-        
         # Get node in tree T to edit
-        if gamma_j_minus_1 in self.access_string_reference.keys():
-            node_to_edit = memoize(self.__sift_return_node(gamma_j_minus_1))
-        else:
-            node_to_edit = self.__sift_return_node(gamma_j_minus_1)
-        s_j_minus_1 = node_to_edit.value
+        node_to_edit = self.__sift_return_node(gamma_j_minus_1)
     
         # The new distinguishing string is the character gamma[j] concatonated with
         # the last common ancestor distinguishing string between access_string_sift and access_string_m_hat in T
-        new_d = gamma[3*j : 3*j + 3] + lca
+        new_d = gamma[j : j + 1] + lca
 
-        # new node is the distinguishing string
+        return node_to_edit, gamma_j_minus_1, new_d
 
-        assert new_d
-        assert self.my_teacher.member(s_j_minus_1 + new_d) != self.my_teacher.member(gamma_j_minus_1 + new_d)
+    ##########################################################################################################
+
+    def __binary_search_decomposition(self, gamma):
+        '''
+        Finds a breakpoint of the counterexample gamma with a binary search (Rivest-Schapire), using a logarithmic number of sifts in the length of gamma.
+        With u_i the access string of the state M_hat reaches on the first i symbols of gamma and v_i the rest of gamma,
+        member(u_0 + v_0) = member(gamma) and member(u_m + v_m) = member(u_m) is the answer M_hat gives for gamma, so these differ.
+        The search finds an i where member(u_i + v_i) != member(u_i+1 + v_i+1): then u_i + gamma[i] (which M_hat sends to u_i+1) is distinguished from u_i+1 by v_i+1.
+        Returns the leaf in T to split, the new access string, and the new distinguishing string
+        :param gamma: counterexample provided by equivalence query
+        '''
 
-        # create a parent for our new node
-        temp = node_to_edit.parent
+        def alpha(i):
+            '''Returns member(u_i + v_i) for the split of gamma after its first i symbols'''
+            u_i = self.m_hat.access_string(gamma[0 : i])
+            return self.my_teacher.member(u_i + gamma[i :])
+
+        # alpha(low) always agrees with member(gamma) and alpha(high) never does
+        low = 0
+        high = len(gamma)
+        target = self.my_teacher.member(gamma)
+        assert alpha(high) != target
+
+        while high - low > 1:
+            middle = (low + high)//2
+            if alpha(middle) == target:
+                low = middle
+            else:
+                high = middle
 
-        node_to_edit.parent = Node(None, temp, node_to_edit.level)
-        node_to_edit.level += 1
+        # The new access string is u_low + gamma[low], which M_hat sends to the state with access string u_high
+        new_access_string = self.m_hat.access_string(gamma[0 : low]) + gamma[low : high]
+        node_to_edit = self.__sift_return_node(new_access_string)
+        assert node_to_edit.value == self.m_hat.access_string(gamma[0 : high])
 
-        # set parent value to distinguishing string
-        node_to_edit.parent.value = new_d
-        if(temp.left_child.value == node_to_edit.value):
-            temp.left_child = node_to_edit.parent
-        else:
-            assert temp.right_child.value == node_to_edit.value
-            temp.right_child = node_to_edit.parent
+        # The new distinguishing string is the rest of gamma
+        new_d = gamma[high :]
+
+        return node_to_edit, new_access_string, new_d
+
+    ##########################################################################################################
+
+    def __split_leaf(self, node_to_edit, new_access_string, new_d):
+        '''
+        Splits a leaf of T into a node with distinguishing string new_d whose children are the old leaf and a new leaf for new_access_string.
+        Also adds new_access_string to the registry of states
+        :param node_to_edit: the leaf being split
+        :param new_access_string: the access string of the new leaf
+        :param new_d: the distinguishing string between the access string of node_to_edit and new_access_string
+        '''
+
+        s_j_minus_1 = node_to_edit.value
+        gamma_j_minus_1 = new_access_string
+
+        # new node is the distinguishing string
 
-        # determine whether our current "node to edit", which contains the access string, is left or right child (acc/rej)
+        assert new_d
+        assert self.my_teacher.member(s_j_minus_1 + new_d) != self.my_teacher.member(gamma_j_minus_1 + new_d)
+
+        # The leaf becomes the node holding the distinguishing string (so that sifts which ended at the leaf resume from it),
+        # and both access strings move down into new leaves beneath it
         assert (not node_to_edit.left_child) and (not node_to_edit.right_child)
-        # this statement should still be true because we have not changed the child of our NEW PARENT to node_to_edit
+        node_to_edit.value = new_d
+        old_leaf = Node(s_j_minus_1, node_to_edit, node_to_edit.level + 1)
+        new_leaf = Node(gamma_j_minus_1, node_to_edit, node_to_edit.level + 1)
 
+        # determine whether each access string is the left or right child (acc/rej)
         if self.my_teacher.member(s_j_minus_1 + new_d) and not self.my_teacher.member(gamma_j_minus_1 + new_d):
-            node_to_edit.parent.right_child = node_to_edit
-            node_to_edit.parent.left_child = Node(gamma_j_minus_1, node_to_edit.parent, node_to_edit.level)
+            node_to_edit.right_child = old_leaf
+            node_to_edit.left_child = new_leaf
         elif self.my_teacher.member(gamma_j_minus_1 + new_d) and not self.my_teacher.member(s_j_minus_1 + new_d):
-            node_to_edit.parent.left_child = node_to_edit
-            node_to_edit.parent.right_child = Node(gamma_j_minus_1, node_to_edit.parent, node_to_edit.level)
+            node_to_edit.left_child = old_leaf
+            node_to_edit.right_child = new_leaf
         else:
-            print(f"Both {s_j_minus_1 + new_d} and {gamma_j_minus_1 + new_d} are {"accepted" if self.my_teacher.member(s_j_minus_1 + new_d) else "rejected"}")
-            exit(f"Error: Unable to sort access string {gamma_j_minus_1} into T")
+            print(f"Both {self.alphabet.decode(s_j_minus_1 + new_d)} and {self.alphabet.decode(gamma_j_minus_1 + new_d)} are {"accepted" if self.my_teacher.member(s_j_minus_1 + new_d) else "rejected"}")
+            exit(f"Error: Unable to sort access string {self.alphabet.decode(gamma_j_minus_1)} into T")
+
+        # Update the registry with the new leaf of the old access string and the new access string
+        self.states.move_leaf(s_j_minus_1, old_leaf)
+        self.states.add(gamma_j_minus_1, new_leaf)
+
+        # Save the split so that the next M_hat only recomputes the transitions affected by it
+        self.last_split = (s_j_minus_1, gamma_j_minus_1)
 
     ##########################################################################################################
 
     def construct_hypothesis(self):
         '''
         Constructs a hypothesized DFA M_Hat from the classification tree self.t.
-        Returns array representing the DFA
+        If the only change to self.t since M_Hat was last constructed is the split of one leaf, only the transitions affected by that split are recomputed.
+        Returns the DFA
         '''
 
-        to_become = []
+        if self.last_split is not None:
+            split_access_string, new_access_string = self.last_split
+            self.last_split = None
+            return self.__update_hypothesis(split_access_string, new_access_string)
 
-        # for each access string (leaf) of T, create a state in M_hat
-        for key in self.access_string_reference.keys():
-            to_append = []
-            
-            # Save a boolean indicating if the given key corresponds to an accept or reject state
-            if self.my_teacher.member(key):
-                to_append.append(1)
-            else:
-                to_append.append(0)
+        # Create space for the arrows of every access string (leaf) of T
+        to_become = np.full((len(self.states), len(self.alphabet) + 1), -1, dtype=np.int32)
 
-            # Create space for the arrows
-            for i in range(len(self.alphabet)):
-                to_append.append(-1)
-            
-            to_become.append(to_append)
+        # for each access string (leaf) of T, create a state in M_hat
+        # Save a boolean indicating if the given key corresponds to an accept or reject state
+        to_become[:, 0] = self.my_teacher.member_batch(self.states.access_strings)
 
         # start state of M_hat is lambda, the empty string
-        # for each state in M_hat and each symbol b in the language, compute the b-transition out of the access string s:
-        for key in self.access_string_reference.keys():
-            # for each symbol b in the language, sift
-            for b in self.alphabet:
-                resulting_state = self.__sift(key + b)
-                # direct the b-transition out of s to the resulting sifted state in M_hat
-                to_direct = self.access_string_reference[resulting_state]
-                # set TO BECOME [ index of key string ] [ index of character b in alphabet ] to be equal to to_direct
-                to_become[self.access_string_reference[key]][self.alphabet.index(b) + 1] = to_direct
+        # for each state in M_hat and each symbol b in the language, compute the b-transition out of the access string s by sifting s + b
+        # (all of these strings are sifted together so that the membership queries are asked in batches)
+        transitions = [(state, b_index) for state in range(len(self.states)) for b_index in range(len(self.alphabet))]
+        resulting_leaves = self.__sift_many([self.states.access_string_of(state) + (b_index,) for state, b_index in transitions])
+
+        for (state, b_index), resulting_leaf in zip(transitions, resulting_leaves):
+            # direct the b-transition out of s to the resulting sifted state in M_hat
+            # set TO BECOME [ index of key string ] [ index of character b in alphabet ] to be equal to to_direct
+            to_become[state, b_index + 1] = self.states.state_of_leaf(resulting_leaf)
 
         # Ensure that all -1s have been overwritten
-        for row in to_become:
-            for entry in row:
-                assert entry >= 0
+        assert (to_become >= 0).all()
 
         # return updated M_Hat
-        return to_become
+        return Hypothesis(to_become, self.alphabet, self.states.access_strings)
+
+    ##########################################################################################################
+
+    def __update_hypothesis(self, split_access_string, new_access_string):
+        '''
+        Returns a copy of M_Hat updated for a split of the leaf of split_access_string in T, which created the leaf of new_access_string.
+        Each transition of M_Hat records the leaf (state) its sift landed on, so only the transitions which landed on the split leaf
+        and the transitions out of the new state need to be sifted again; every other transition still lands on the same leaf.
+        :param split_access_string: the access string of the leaf which was split
+        :param new_access_string: the access string of the leaf created by the split
+        '''
+
+        split_state = self.states.state_of(split_access_string)
+        new_state = self.states.state_of(new_access_string)
+        assert new_state == len(self.m_hat)
+
+        access_strings = self.states.access_strings
+
+        # Add a row for the new state, saving a boolean indicating if it is an accept or reject state
+        new_row = np.full((1, len(self.alphabet) + 1), -1, dtype=np.int32)
+        new_row[0, 0] = 1 if self.my_teacher.member(new_access_string) else 0
+        to_become = np.vstack((self.m_hat.table, new_row))
+
+        # The transitions which pointed to the split leaf now land on one of its two halves, so sift them again,
+        # along with every transition out of the new state
+        states, b_indices = np.nonzero(to_become[:, 1:] == split_state)
+        transitions = list(zip(states.tolist(), b_indices.tolist())) + [(new_state, b_index) for b_index in range(len(self.alphabet))]
+        resulting_leaves = self.__sift_many([access_strings[state] + (b_index,) for state, b_index in transitions])
+
+        for (state, b_index), resulting_leaf in zip(transitions, resulting_leaves):
+            to_become[state, b_index + 1] = self.states.state_of_leaf(resulting_leaf)
+
+        # Ensure that all -1s have been overwritten
+        assert (to_become >= 0).all()
+
+        return Hypothesis(to_become, self.alphabet, self.states.access_strings)
 
     ##########################################################################################################
 
@@ -503,11 +573,11 @@ class Learner:
         '''
         sifts string s through the Tree T and returns the leaf NODE (not the access string, which is the Node's value) in T for the state in M accessed by string s
         :param s: the string being sifted
-        NOTE: this function will be called as a memoized version of itself if the param s is an access string
+        NOTE: the node at which each sift of s ended is cached, so sifting s again only costs the membership queries below that node
         '''
 
-        # set current node to root of T
-        current = self.t.root
+        # set current node to the node at which s was last sifted (T only grows by turning leaves into nodes, so s still belongs below it), or to the root of T
+        current = self.sift_cache.get(s, self.t.root)
 
         loops_to_find_leaf = 0
 
@@ -533,24 +603,145 @@ class Learner:
 
         #print("loops to find leaf: " + str(loops_to_find_leaf))
 
+        self.sift_cache[s] = current
+
         # Check that access string is properly stored
-        assert (current.value in self.access_string_reference.keys())
+        assert (current in self.states.leaf_reference)
         
         # Return the access string at the leaf found
         return current
 
     ##########################################################################################################
 
-    def __sift(self, s):
+    def __sift_many(self, strings):
         '''
-        Returns the access string from tree T associated with the state of M accessed by string s.
-        Calls sift_return_node and then returns the value from the node.
-        :param s: the string s being sifted
+        sifts a list of strings through the Tree T together and returns the list of leaf NODES they reach.
+        Every string moves down one level of T at a time, and the membership queries for each level are asked in a single batch
+        :param strings: the strings being sifted
         '''
 
-        if s in self.access_string_reference.keys():
-            return memoize(self.__sift_return_node(s)).value
-        return self.__sift_return_node(s).value
+        # Start each string at the node at which it was last sifted, or at the root of T
+        current = [self.sift_cache.get(s, self.t.root) for s in strings]
+
+        # Indices of the strings which have not yet reached a leaf
+        pending = [i for i in range(len(strings)) if current[i].left_child]
+
+        while pending:
+            # membership queries on sd (concatenated) for the distinguishing string d at each string's current node
+            answers = self.my_teacher.member_batch([strings[i] + current[i].value for i in pending])
+
+            # if membership query is accepted, current node is right child of current node, else left child
+            for i, accepted in zip(pending, answers):
+                current[i] = current[i].right_child if accepted else current[i].left_child
+
+            pending = [i for i in pending if current[i].left_child]
+
+        for s, leaf in zip(strings, current):
+            self.sift_cache[s] = leaf
+
+        return current
+
+##############################################################################################################
+
+class State_Registry:
+
+    ##########################################################################################################
+
+    def __init__(self):
+        '''
+        State_Registry constructor.
+        Holds each state of M_hat as its access string, its index (row in M_hat), and its leaf in T, with constant-time lookups in every direction
+        '''
+
+        # Access strings in order of their rows in M_hat
+        self.access_strings = []
+
+        # Leaves in T in order of their rows in M_hat
+        self.leaves = []
+
+        # dictionaries from access strings and from leaves to rows in M_hat
+        self.access_string_reference = {}
+        self.leaf_reference = {}
+
+    ##########################################################################################################
+
+    def __len__(self):
+        '''Returns the number of states'''
+        return len(self.access_strings)
+
+    def __contains__(self, access_string):
+        '''Returns a boolean indicating if the given access string belongs to a state'''
+        return access_string in self.access_string_reference
+
+    ##########################################################################################################
+
+    def add(self, access_string : tuple, leaf):
+        '''
+        Adds a new state and returns its index (its row in M_hat)
+        :param access_string: the access string of the new state
+        :param leaf: the Node in T holding the access string
+        '''
+
+        # Print debugging information if trying to clobber a pre-existing key:
+        if access_string in self.access_string_reference:
+            print(f"Error: Trying to clobber key {access_string}")
+            exit(1)
+
+        state = len(self.access_strings)
+
+        self.access_strings.append(access_string)
+        self.leaves.append(leaf)
+        self.access_string_reference[access_string] = state
+        self.leaf_reference[leaf] = state
+
+        return state
+
+    ##########################################################################################################
+
+    def move_leaf(self, access_string : tuple, leaf):
+        '''
+        Moves a state to a new leaf in T (when the state's old leaf becomes a node holding a distinguishing string)
+        :param access_string: the access string of the state
+        :param leaf: the new Node in T holding the access string
+        '''
+
+        state = self.access_string_reference[access_string]
+
+        del self.leaf_reference[self.leaves[state]]
+        self.leaves[state] = leaf
+        self.leaf_reference[leaf] = state
+
+    ##########################################################################################################
+
+    def state_of(self, access_string : tuple):
+        '''
+        Returns the index of the state with the given access string
+        :param access_string: the access string of the state
+        '''
+        return self.access_string_reference[access_string]
+
+    def state_of_leaf(self, leaf):
+        '''
+        Returns the index of the state held in the given leaf of T
+        :param leaf: the Node in T holding the state's access string
+        '''
+        return self.leaf_reference[leaf]
+
+    def access_string_of(self, state : int):
+        '''
+        Returns the access string of the state with the given index
+        :param state: int, the index of the state
+        '''
+        return self.access_strings[state]
+
+    def leaf_of(self, state : int):
+        '''
+        Returns the leaf in T holding the state with the given index
+        :param state: int, the index of the state
+        '''
+        return self.leaves[state]
+
+    ##########################################################################################################
 
 ##############################################################################################################
 
@@ -558,10 +749,10 @@ class Node:
 
     ##########################################################################################################
 
-    def __init__(self, value : str, parent, level):
+    def __init__(self, value : tuple, parent, level):
         '''
         Node constructor
-        :param value: the string stored in the node
+        :param value: the word (tuple of symbol ids) stored in the node
         :param parent: the Node that is self's parent
         :param level: an int representing the level of the Node in T (root = 0)
         '''
@@ -608,9 +799,10 @@ class Tree:
 
     ##########################################################################################################
 
-    def print_tree(self):
+    def print_tree(self, alphabet=None):
         '''
         Prints the tree to terminal
+        :param alphabet: the Alphabet used to print the words in the tree as strings of symbols (if not given, the words are printed as tuples of symbol ids)
         '''
         stack = []
         stack.append(self.root)
@@ -630,6 +822,7 @@ class Tree:
             # Specify if the string is a distinguishing string or access string
             # If the string is empty, print "empty." If it is NoneType, indicate lack of initialization. If it has a non-empty value, print it
             # Also print the level at which the node is located
-            print(f"{"d" if to_print.left_child else "s"}: {("empty" if to_print.value == "" else to_print.value) if (to_print.value != None) else "not initialized"}, level {to_print.level}")
+            value = alphabet.decode(to_print.value) if (alphabet and to_print.value is not None) else to_print.value
+            print(f"{"d" if to_print.left_child else "s"}: {("empty" if not to_print.value else value) if (to_print.value != None) else "not initialized"}, level {to_print.level}")
 
     ##########################################################################################################
@@ -74,4 +74,5 @@ def write_alphabet():
     f.close()
 
 # MAIN
-write_alphabet()
\ No newline at end of file
+if __name__ == "__main__":
+    write_alphabet()
\ No newline at end of file
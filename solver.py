@@ -9,20 +9,7 @@ import xlwt
 from xlwt import Workbook
 
 from learner import Learner
-
-def __read_line(line, alphabet):
-    '''
-    FUNCTION DOCUMENTATION HERE
-    '''
-    # If the line ends in a new line character, add everything except the new line character as an entry in the alphabet
-    if line[len(line) - 1] == "\n":
-        assert len(line) == 4
-        alphabet.append(line[0:len(line)-1])
-    
-    # If the line doesn't end in a new line character, add it as an entry in the alphabet
-    else:
-        assert len(line) == 3
-        alphabet.append(line)
+from alphabet import Alphabet
 
 ##############################################################################################
 
@@ -33,30 +20,15 @@ def __write_dfa_to_file(dfa, loc, file_name):
 
     # Return None if no file is provided
     try:
-        dfa_file = open(os.path.join(loc, file_name), "w")
-    except:
+        dfa.write_to_file(os.path.join(loc, file_name))
+    except OSError:
         print(f"Error: No file {file_name} found.")
         return
 
-    for row in dfa:
-        for entry in row:
-            dfa_file.write(str(entry))
-
-            # Space between entries in a row
-            if row.index(entry) < len(row) - 1:
-                dfa_file.write(' ')
-        
-        # New line between rows     
-        if dfa.index(row) < len(dfa) - 1:
-            dfa_file.write('\n')
-    
-    # Close file
-    dfa_file.close()
-
 
 ##########################################################################################################
 
-def run_solver(mem_per_eq:int, show_graphs:bool, accuracy_checks:bool, wb:Workbook=None, test_id:int=0):
+def run_solver(mem_per_eq:int, show_graphs:bool, accuracy_checks:bool, wb:Workbook=None, test_id:int=0, processes:int=1, epsilon:float=None, delta:float=None):
     '''
     Runs an instance of learning the HexWorld DFAs with a specified number of membership queries.
     Will print two DFAs to separate text files of movement_dfa.txt and direction_dfa.txt.
@@ -66,28 +38,28 @@ def run_solver(mem_per_eq:int, show_graphs:bool, accuracy_checks:bool, wb:Workbo
     :param accuracy_checks: boolean value determining if accuracy checks are performed at every stage of updating M_Hat
     :param wb: the name of the Excel workbook accuracy values would be written to if applicable
     :param test_id: a number to add to the name of the sheet within the Excel workbook, if applicable
+    :param processes: the number of worker processes each teacher uses to answer membership queries
+    :param epsilon: if given (with delta), the equivalence queries are PAC queries allowing this much error instead of using mem_per_eq
+    :param delta: the probability allowed of a learned DFA having more than epsilon error
     '''
-    alphabet = []
-
     print("start")
 
     # reading the alphabet from a file
     __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
-    file = open(os.path.join(__location__, "alphabet.txt"), "r")
-    for line in file:
-        __read_line(line, alphabet)
+    alphabet = Alphabet.from_file(os.path.join(__location__, "alphabet.txt"))
 
     total_start = time.time()
 
     # Create learners:
     # 0 -> movement teacher, 1 -> direction teacher
-    movement_learner = Learner(mem_per_eq, alphabet=alphabet, teacher_type=0, display_graphs=show_graphs, accuracy_checks=accuracy_checks, wb=wb, test_id=test_id)
-    direction_learner = Learner(mem_per_eq, alphabet=alphabet, teacher_type=1, display_graphs=show_graphs, accuracy_checks=accuracy_checks, wb=wb, test_id=test_id)
+    movement_learner = Learner(mem_per_eq, alphabet=alphabet, teacher_type=0, display_graphs=show_graphs, accuracy_checks=accuracy_checks, wb=wb, test_id=test_id, processes=processes, epsilon=epsilon, delta=delta)
+    direction_learner = Learner(mem_per_eq, alphabet=alphabet, teacher_type=1, display_graphs=show_graphs, accuracy_checks=accuracy_checks, wb=wb, test_id=test_id, processes=processes, epsilon=epsilon, delta=delta)
 
     print("Learners initialized")
     
     # Learn movement teacher using L*
     movement_DFA = movement_learner.lstar_algorithm()
+    movement_learner.my_teacher.close()
     print("FIRST DFA => MOVEMENT => IS DONE")
 
     # write first DFA to a file for ease of access
@@ -98,6 +70,7 @@ def run_solver(mem_per_eq:int, show_graphs:bool, accuracy_checks:bool, wb:Workbo
 
     # Learn direction teacher using L*
     direction_DFA = direction_learner.lstar_algorithm()
+    direction_learner.my_teacher.close()
     print("SECOND DFA => DIRECTION => IS DONE")
 
     # write DFA learned by direction teacher to a file
@@ -131,4 +104,10 @@ if __name__ == "__main__":
         accuracy_checks = False
         wb = None
 
-    run_solver(100, show_graphs, accuracy_checks, wb)
\ No newline at end of file
+    # Number of worker processes answering membership queries, passed as processes=<n>
+    processes = 1
+    for arg in args:
+        if arg.startswith("processes="):
+            processes = int(arg.split("=")[1])
+
+    run_solver(100, show_graphs, accuracy_checks, wb, processes=processes)
\ No newline at end of file
@@ -1,21 +1,14 @@
 import random
+import math
+import multiprocessing
+import threading
+import numpy as np
+from collections import OrderedDict
 from hex_world import World, Ident
+from dfa import DFA
+from alphabet import Alphabet
 import make_alphabet
 import pdb
-import functools
-
-
-def memoize(obj):
-    '''memoize method and information from https://wiki.python.org/moin/PythonDecoratorLibrary#Memoize'''
-    cache = obj.cache = {}
-
-    @functools.wraps(obj)
-    def memoizer(*args, **kwargs):
-        key = str(args) + str(kwargs)
-        if key not in cache:
-            cache[key] = obj(*args, **kwargs)
-        return cache[key]
-    return memoizer
 
 ##############################################################################################################
 
@@ -28,82 +21,91 @@ class Teacher:
     # NOTE: The maximum number of idents is arbitrary
     MAX_NUM_IDENTS = 50
 
+    # Default number of membership query answers kept by each Teacher
+    CACHE_SIZE = 1 << 20
+
     # Constructor
-    def __init__(self, alphabet, mem_per_eq:int=100, seed=-1, premade_dfa=None):
+    def __init__(self, alphabet, mem_per_eq:int=100, seed=-1, premade_dfa=None, processes:int=1, chunksize:int=None, cache_size:int=CACHE_SIZE, epsilon:float=None, delta:float=None, closed_form:bool=True):
         '''
         Teacher constructor
-        :param alphabet: the alphabet used for the Teacher's DFA M
+        :param alphabet: the alphabet used for the Teacher's DFA M (an Alphabet, or a list of three-character symbols)
         :param mem_per_eq: the number of membership queries per equivalence query in L-Star
         :param seed: seed for a randomly generated DFA, if applicable
-        :param premade_dfa: a premade DFA, in the form of an array, to be the DFA M for the teacher, if applicable
+        :param premade_dfa: a premade DFA, either a DFA or in the form of an array, to be the DFA M for the teacher, if applicable
+        :param processes: the number of worker processes used to answer batches of membership queries (1 answers them in this process)
+        :param chunksize: the number of queries sent to a worker process at a time (defaults to the multiprocessing default)
+        :param cache_size: the maximum number of membership query answers the Teacher remembers
+        :param epsilon: the error allowed in the learned DFA (PAC equivalence queries); if given with delta, replaces mem_per_eq
+        :param delta: the probability allowed of the learned DFA having more than epsilon error (PAC equivalence queries)
+        :param closed_form: whether the agent's next move is computed from the agent and goal cells (see _next_move()) instead of simulating the world, when possible
         '''
 
-        self.alphabet = alphabet
+        # Arguments used to build a copy of this Teacher in each worker process (which answers membership queries one process at a time)
+        self._init_args = [alphabet, mem_per_eq, seed, premade_dfa]
+        self._init_kwargs = {"cache_size": cache_size, "closed_form": closed_form}
+
+        # Whether to compute the agent's next move without building the world, when the world allows it
+        self.closed_form = closed_form
+
+        # Pool of worker processes answering membership queries, created the first time a batch is answered in parallel
+        self.processes = processes
+        self.chunksize = chunksize
+        self.pool = None
 
         self.mem_per_eq = mem_per_eq
 
+        # PAC equivalence queries: the i-th equivalence query tests ceil((1/epsilon)(ln(1/delta) + i ln 2)) random worlds
+        assert (epsilon is None) == (delta is None)
+        assert epsilon is None or (0 < epsilon < 1 and 0 < delta < 1)
+        self.epsilon = epsilon
+        self.delta = delta
+
+        # The number of equivalence queries answered, and (for PAC equivalence queries) the chance that the last one accepted a hypothesis with more
+        # than epsilon error, and the sum of those chances over every equivalence query so far (at most delta, see equivalence_samples())
+        self.equivalence_queries = 0
+        self.query_delta = None
+        self.total_delta = None
+
+        # Every random world tested by an equivalence query, with its answer (each new hypothesis is checked against all of them first)
+        self.sample_pool = Sample_Pool()
+
         # Check the alphabet for validity (each symbol is three characters)
         for symbol in alphabet:
             if len(symbol) != 3:
                 print("Error: Invalid alphabet. All symbols must be three hexadecimal characters.")
                 exit(1)
 
-        self.seed = seed
-        if seed == -1:
-            self.seed = 1821
-
-        if premade_dfa:
-            self.m = premade_dfa
-        
-        # Create empty world with space for idents
-        self.world = World(display_window=False)
+        self.alphabet = alphabet if isinstance(alphabet, Alphabet) else Alphabet(alphabet)
+        self._init_args[0] = self.alphabet
 
-        # There is enough space for all regular idents and all goals in the ident list
-        # NOTE: May need to add space here if allowing multiple agents to be created
-        self.ident_list = []
-        for i in range(Teacher.MAX_NUM_IDENTS + Teacher.MAX_NUM_GOALS):
-            self.ident_list.append(Ident(matrix_index=-1, list_index=-1, world=self.world))
-       
-        self.agents = [Ident(matrix_index=-1, list_index=-1, world=self.world, property="agent")]*10
-        
-        self.goal_list = [Ident(matrix_index=-1, list_index=-1, world=self.world, property="goal")]*Teacher.MAX_NUM_GOALS
-        
-        # How many agents and idents are currently being used
-        self.valid_idents = 0
-        self.valid_agents = 0
+        # The number of membership queries answered by the Teacher (repeated queries are only counted once, unless their answer was evicted from the cache)
+        self.membership_queries = 0
 
-        self.wall_list = []
+        # Cache of the answers to membership queries, with the queried words as keys
+        self.answers = Membership_Cache(cache_size)
 
-        ''' walls just for the test case where things are a 5x5 square'''
-        # NOTE: Remove these walls and expand the number of valid characters in the alphabet to enable worlds larger thatn 5x5
-        for i in range(5, 12):
-            new_ident = Ident(5, i, self.world)
-            new_ident.state = -2
-            self.world.hex_matrix[5][i].idents.append(new_ident)
-            self.wall_list.append(new_ident)
+        self.seed = seed
+        if seed == -1:
+            self.seed = 1821
 
-            new_ident2 = Ident(11, i, self.world)
-            new_ident2.state = -2
-            self.world.hex_matrix[11][i].idents.append(new_ident2)
-            self.wall_list.append(new_ident2)
+        # Random number generator for generate_words() (seeded from the random module, so that random.seed() still controls the worlds generated)
+        self.rng = np.random.default_rng(random.getrandbits(64))
 
-            new_ident3 = Ident(i, 5, self.world)
-            new_ident.state3 = -2
-            self.world.hex_matrix[i][5].idents.append(new_ident3)
-            self.wall_list.append(new_ident3)
+        # Tables used by generate_words(), built the first time worlds are generated
+        self.cells = None
 
-            new_ident4 = Ident(i, 11, self.world)
-            new_ident4.state = -2
-            self.world.hex_matrix[i][11].idents.append(new_ident4)
-            self.wall_list.append(new_ident4)
+        # The Teacher's DFA M (None if the Teacher answers membership queries some other way, as its subclasses do)
+        self.m = None
+        if premade_dfa is not None:
+            self.m = premade_dfa if isinstance(premade_dfa, DFA) else DFA(premade_dfa, self.alphabet)
         
+        # Worlds (each with its own idents) in which membership queries are answered by simulation. A query checks a World_Context out of the pool
+        # while it is being answered (see checkout_world()), so that one Teacher can answer several queries at once (from threads, for example)
+        self.world_pool = []
+        self.world_pool_lock = threading.Lock()
 
-        self.surrounding_walls : int = len(self.wall_list)
-        self.valid_walls : int = self.surrounding_walls
-
-        # NOTE: This may need to be adjusted depending on the number of other (non-ring) walls allowed to be created
-        for i in range (50):
-            self.wall_list.append(Ident(matrix_index=-1, list_index=-1, world=self.world, state=-2))
+        # The World_Context used by _create_world()
+        self.world_context = World_Context(self.alphabet)
 
     ##########################################################################################################
 
@@ -111,194 +113,349 @@ class Teacher:
         '''
         An equivalence query which determines if two DFAs, M and M_Hat, are equivalent.
         Returns either False if the DFAs are equivalent (to represent the lack of a countereaxmple).
-        If the DFAs are not equivalent, return a counterexample string (a string that one DFA accepts and the other rejects)
-        :param m_hat: the DFA being compared to Teacher's DFA (M)
+        If the DFAs are not equivalent, return a counterexample word (a word that one DFA accepts and the other rejects)
+        If the Teacher holds a DFA M, the check is exact (see __exact_counterexample()); otherwise random worlds are tested:
+        mem_per_eq of them, or, if the Teacher was given epsilon and delta, the number given by equivalence_samples()
+        :param m_hat: the hypothesis (a DFA) being compared to Teacher's DFA (M)
         '''
 
         assert m_hat
 
+        self.equivalence_queries += 1
+
+        if self.m is not None:
+            counterexample = self.__exact_counterexample(m_hat)
+            if counterexample is None:
+                print("No counterexample found")
+                return False
+            return counterexample
+
+        # The i-th PAC equivalence query accepts a hypothesis with more than epsilon error with a chance of at most delta/2^i,
+        # whether or not it finds a counterexample, so that the chances of all of them sum to delta(1 - 1/2^i) < delta
+        if self.epsilon is not None:
+            self.query_delta = self.delta / 2**self.equivalence_queries
+            self.total_delta = self.delta * (1 - 1 / 2**self.equivalence_queries)
+
+        # Check M_hat against the worlds tested by earlier equivalence queries (their answers are already known, so this only runs M_hat)
+        counterexample = self.sample_pool.find_mismatch(m_hat)
+        if counterexample is not None:
+            return counterexample
+
         # Generate and test an arbitrarily large number of strings
-        # for each of these strings, if self.member(s, self.m) is not self.member(s, m_hat), return s
+        # for each of these strings, if self.member(s) is not m_hat.accepts(s), return s
+        num_samples = self.equivalence_samples(self.equivalence_queries) if self.epsilon is not None else self.mem_per_eq
+        samples = self.generate_words(num_samples)
 
-        for i in range(self.mem_per_eq):
-            s = Teacher.generate_string()
+        # Ask all of the membership queries in one batch and run all of the samples through M_hat at once
+        answers = self.member_batch(samples)
+        hypothesis_answers = m_hat.accepts_many(samples)
+
+        self.sample_pool.add(samples, answers)
+
+        for s, answer, hypothesis_answer in zip(samples, answers, hypothesis_answers):
             # return counterexample if one exists
-            if self.member(s) != self.member(s, m_hat):
-                return s            
+            if answer != hypothesis_answer:
+                return s
 
         # else return false (so that the truthiness of a counterexample and a matching DFA result will be different)
         print("No counterexample found")
+
+        # Report the guarantee given by the schedule: a hypothesis with more than epsilon error would have agreed with all num_samples worlds
+        # with a chance under (1 - epsilon)^num_samples <= delta/2^i, and the whole run has accepted such a hypothesis with a chance under total_delta
+        if self.epsilon is not None:
+            print(f"{num_samples} worlds tested: error at most {self.epsilon}, except with probability at most {self.query_delta} for this query "
+                  f"(at most {self.total_delta} <= {self.delta} over all {self.equivalence_queries} equivalence queries)")
+
         return False
 
     ##########################################################################################################
+
+    def equivalence_samples(self, i : int):
+        '''
+        Returns the number of random worlds tested by the i-th PAC equivalence query (Angluin): ceil((1/epsilon)(ln(1/delta) + i ln 2)).
+        The delta/2^i chances of accepting a bad hypothesis at each query sum to at most delta over the whole run
+        :param i: the number of the equivalence query (starting at 1)
+        '''
+        return math.ceil((math.log(1/self.delta) + i*math.log(2))/self.epsilon)
+
+    ##########################################################################################################
+
+    def __exact_counterexample(self, m_hat):
+        '''
+        Returns a shortest word on which M and M_hat disagree, or None if they are equivalent.
+        Does a breadth-first search over the product of the two DFAs (pairs of states (state of M, state of M_hat)) starting at (0, 0),
+        one layer of pairs at a time; the first pair reached whose states have different accept bits gives the counterexample
+        :param m_hat: the DFA being compared to Teacher's DFA (M)
+        '''
+
+        m_table = self.m.table
+        m_hat_table = m_hat.table
+        num_m_hat_states = len(m_hat)
+
+        # Each pair is numbered (state of M) * (number of states of M_hat) + (state of M_hat)
+        # For each pair reached, save the pair it was reached from and the symbol read to reach it (-1 if not yet reached)
+        previous_pair = np.full(len(self.m) * num_m_hat_states, -1, dtype=np.int64)
+        previous_symbol = np.full(len(self.m) * num_m_hat_states, -1, dtype=np.int64)
+        previous_pair[0] = 0
+
+        frontier = np.zeros(1, dtype=np.int64)
+        while frontier.size:
+            m_states, m_hat_states = np.divmod(frontier, num_m_hat_states)
+
+            # Check the accept bits of the whole layer at once
+            disagreements = np.flatnonzero(m_table[m_states, 0] != m_hat_table[m_hat_states, 0])
+            if disagreements.size:
+                # Follow the saved pairs back to (0, 0) to build the counterexample
+                pair = int(frontier[disagreements[0]])
+                word = []
+                while pair != 0:
+                    word.append(int(previous_symbol[pair]))
+                    pair = int(previous_pair[pair])
+
+                # The start states always agree, as M_hat's start state is labeled by a membership query on the empty word
+                assert word
+                return tuple(reversed(word))
+
+            # Every pair reachable from the layer by one symbol (rows are the pairs of the layer, columns are the symbols)
+            successors = m_table[m_states, 1:].astype(np.int64) * num_m_hat_states + m_hat_table[m_hat_states, 1:]
+
+            # Keep the first way each new pair is reached
+            successors = successors.ravel()
+            new_pairs, first_index = np.unique(successors, return_index=True)
+            unseen = previous_pair[new_pairs] == -1
+            new_pairs = new_pairs[unseen]
+            first_index = first_index[unseen]
+
+            previous_pair[new_pairs] = frontier[first_index // len(self.alphabet)]
+            previous_symbol[new_pairs] = first_index % len(self.alphabet)
+
+            frontier = new_pairs
+
+        return None
+
+    ##########################################################################################################
     
     @staticmethod
-    def final_state(s : str, dfa: list[list[int]], alpha):
+    def final_state(s : tuple, dfa: DFA):
         '''
-        Static method that returns the state in a specified DFA from a string (ie whether that string is rejected or accepted).
-        :param s: the string we are checking
-        :param dfa: the dfa we are putting the string through
-        :param alpha: the alphabet that the string and the dfa share
+        Static method that returns the index of the state in a specified DFA reached by a word (use dfa.is_accepting() to see whether that word is rejected or accepted).
+        :param s: the word (tuple of symbol ids) we are checking
+        :param dfa: the dfa we are putting the word through
         '''
 
-        input = []
-
-        assert (type(s) is str)
+        assert (type(s) is tuple)
 
-        # Convert passed string into an array of ints, where each int is the index in the alphabet array corresponding to that character
-        for i in range(int(len(s)/3)):
-            input.append(alpha.index(s[i*3 : i*3 + 3]))
+        # Enter the DFA (M) at state 0 and navigate through the DFA to the final state
+        return dfa.run(s)
         
-        # Enter the DFA (M) at state 0
-        next_state_index = 0
+    ##########################################################################################################
+
+    def _create_world(self, s : tuple):
+        '''
+        Builds the world described by s in the Teacher's own World_Context (see World_Context.create_world()), leaving it in self.world with its agent in self.my_agent.
+        NOTE: this is not reentrant; membership queries check out a World_Context of their own instead
+        :param s: The word (tuple of symbol ids) that represents the world
+        '''
+        self.world_context.create_world(s)
+
+    @property
+    def world(self):
+        '''The World built by the last call to _create_world()'''
+        return self.world_context.world
+
+    @property
+    def my_agent(self):
+        '''The agent of the World built by the last call to _create_world()'''
+        return self.world_context.my_agent
 
-        # Navigate through the DFA to the final state
-        for char_index in input:
-            current_state = dfa[next_state_index]
-            next_state_index = current_state[char_index + 1]
-        
-        # Return final state
-        return dfa[next_state_index]
-        
     ##########################################################################################################
 
-    def _create_world(self, s):
+    def checkout_world(self):
         '''
-        Creates an iteration of World from hexv2.py with the arrangement specified in s.
-        Note that it does not create a completely new world, but sets certain idents to be "valid" as an effort for memory storage.
-        :param s: The string that represents the world with 3 hexadecimal characters (ie. f66 is a goal ident in position 6, 6 on the hex grid)
+        Takes a World_Context out of the Teacher's pool (building a new one if the pool is empty) for the caller to build a world in.
+        The World_Context must be returned with checkin_world() once the caller is done with it
         '''
-    
-        # Reset trackers how many idents are valid
-        self.valid_idents = 0
-        self.valid_agents = 0
-        self.valid_goals = 0
-        self.valid_walls = self.surrounding_walls
 
-        # Assert that the length of the world-string is valid
-        assert(len(s) % 3 == 0)
+        with self.world_pool_lock:
+            if self.world_pool:
+                return self.world_pool.pop()
 
-        for hex_row in self.world.hex_matrix:
-            for hex in hex_row:
-                hex.idents.clear()
+        return World_Context(self.alphabet)
 
-        # Parse string into world
-        for i in range(int((len(s))/3)):
+    def checkin_world(self, context):
+        '''
+        Returns a World_Context taken by checkout_world() to the Teacher's pool
+        :param context: the World_Context being returned
+        '''
 
-            # splice the three character string into three one-character chunks
-            property = int(s[i*3], 16)
-            mi = int(s[i*3 + 1], 16)
-            li = int(s[i*3 + 2], 16)
-            
-            
-            # The first char in ever "letter" (3-char string) form the property
-            # The properties are wall (0), stationary non-agent (1), moving agent (in directions 0 through 5, 1 through 7),
-            # stationary agent (8), moving agent (in directions 0 through 5, 9 through e), and goal (f)
+        with self.world_pool_lock:
+            self.world_pool.append(context)
 
-            # 0 => wall
-            if property == 0:
-                new_ident = self.wall_list[self.valid_walls]
+    ##########################################################################################################
 
-                new_ident.matrix_index = mi
-                new_ident.list_index = li
-                assert new_ident.world == self.world
+    def _next_move(self, s : tuple):
+        '''
+        Returns the next move (0, 1 or -1) of the agent in the world described by s, as given by Ident.find_next_move().
+        If closed_form is set, worlds whose first symbol is an agent are answered by __closed_form_move() without building the world;
+        every other world is built in a World_Context checked out of the Teacher's pool and simulated
+        :param s: the word (tuple of symbol ids) that represents the world
+        '''
 
-                new_ident.state = -2
-                self.wall_list.insert(self.valid_walls, new_ident)
-                self.valid_walls += 1
+        if self.closed_form:
+            move = self.__closed_form_move(s)
+            if move is not None:
+                return move
 
-            # If not a wall, it goes on the ident list
-            # (It already is on the ident list, but we iterate to indicate that it is valid)
-            else:
-                new_ident = self.ident_list[self.valid_idents]
+        # Simulate the world in a World_Context of this query's own
+        context = self.checkout_world()
+        try:
+            context.create_world(s)
+            return context.next_move()
+        finally:
+            self.checkin_world(context)
 
-                new_ident.matrix_index = mi
-                new_ident.list_index = li
-                assert new_ident.world == self.world
-                self.valid_idents += 1
-                self.world.hex_matrix[mi][li].idents.append(new_ident)
+    ##########################################################################################################
 
+    def __closed_form_move(self, s : tuple):
+        '''
+        Computes Ident.find_next_move() for the agent described by the first symbol of s with axial arithmetic alone.
+        find_next_move() only depends on the agent's cell and direction and on the cells of the goals: it moves toward whichever of
+        the forward, clockwise and counterclockwise neighbors is closest to a goal (checked in that order, so ties go to the earlier one).
+        Returns None if the world is not of this form (its first symbol is not an agent, or all three neighbors of the agent are off the hex matrix)
+        :param s: the word (tuple of symbol ids) that represents the world
+        '''
 
-            # Set the new ident's state
+        decoded = self.alphabet.decoded
 
-            # 1 => stationary (non-agent)
-            if property == 1:
-                new_ident.state = -1
-            
-            # 2 => direction 0 (non-agent)
-            # 3 => direction 1 (non-agent)
-            # 4 => direction 2 (non-agent)
-            # 5 => direction 3 (non-agent)
-            # 6 => direction 4 (non-agent)
-            # 7 => direction 5 (non-agent)
-            elif property >= 2 and property <= 7:
-                new_ident.state = property - 2
-            
-            # 8 => stationary (agent)
-            if property == 8:
-                new_ident.state = -1
-                # new_world.agents.append(new_ident)
-                self.valid_agents += 1
-            
-            # 9 => direction 0 (agent)
-            # 10 => direction 1 (agent)
-            # 11 => direction 2 (agent)
-            # 12 => direction 3 (agent)
-            # 13 => direction 4 (agent)
-            # 14 => direction 5 (agent)
-            elif property >= 9 and property <= 14:
-                new_ident.state = property - 9
-                # new_world.agents.append(new_ident)
-                self.valid_agents += 1
+        # The first symbol must be a stationary agent (8) or an agent moving in directions 0 through 5 (9 through e)
+        property, agent_mi, agent_li = decoded[s[0]]
+        if not 8 <= property <= 14:
+            return None
 
+        # The agent's state, as set by World_Context.create_world() (-1 if stationary)
+        dir = property - 9
 
-            # 15 => goal (stationary)
-            elif property == 15:
-                new_ident.state = -1
-                # Mark as goal
-                new_ident.property = "goal"
-                # new_world.goals.append(new_ident)
-                self.goal_list.insert(self.valid_goals, new_ident)
-                self.valid_goals += 1
+        # Cells of the goals (15) in the world
+        goals = [(mi, li) for property, mi, li in (decoded[symbol] for symbol in s[1:]) if property == 15]
+        if not goals:
+            return 0
 
-            
-            # Save the first ident described in the string as my_agent
-            if i == 0:
-                self.my_agent = new_ident
+        hex_matrix = self.world.hex_matrix
 
-        
-        # Set world to only contain valid idents by slicing lists stored in self
-        self.world.ident_list = self.ident_list[0:self.valid_idents]
-        self.world.agents = self.agents[0:self.valid_agents]
-        self.world.wall_list = self.wall_list[0:self.valid_walls]
-        self.world.goals = self.goal_list[0:self.valid_goals]
-        assert self.my_agent.world == self.world
+        best_distance = None
+        best_move = 0
+        for move in (0, 1, -1):
+            d_mi, d_li = World.NEIGHBOR_OFFSETS[(dir + move) % 6]
+            mi = agent_mi + d_mi
+            li = agent_li + d_li
+
+            # Neighbors off the hex matrix are skipped by find_next_move()
+            if not (0 <= mi < len(hex_matrix) and 0 <= li < len(hex_matrix[mi])):
+                continue
+
+            # Twice the axial distance (see World.axial_distance()) to the closest goal
+            distance = min(abs(goal_mi - mi) + abs(goal_mi - mi + goal_li - li) + abs(goal_li - li) for goal_mi, goal_li in goals)
+
+            if best_distance is None or distance < best_distance:
+                best_distance = distance
+                best_move = move
+
+        # find_next_move() fails when the agent has no neighbor to move toward, so simulate those worlds
+        if best_distance is None:
+            return None
+
+        return best_move
 
     ##########################################################################################################
 
-    
-    
-    @memoize
-    def member(self, s : str, dfa: list[list[int]] = None, alpha = None):
+    def member(self, s : tuple):
         '''
         Membership query
-        :param s: a string to query
-        :param dfa: a DFA represented as a 2D list
-        returns a boolean indicating whether s is accepted or rejected by the given DFA
+        :param s: a word (tuple of symbol ids) to query
+        returns a boolean indicating whether s is accepted or rejected by the Teacher
+        NOTE: to run a string through a hypothesis (M_hat), use its accepts() method, which never asks the Teacher
         '''
 
-        if not dfa:
-            dfa = self.m
-        
-        if not alpha:
-            alpha = self.alphabet
+        # Answer for the Teacher, asking each string only once
+        answer = self.answers.get(s)
+        if answer is None:
+            self.membership_queries += 1
+            answer = self._answer(s)
+            self.answers.put(s, answer)
 
-        assert dfa
+        return answer
 
-        # Return the int boolean indicating if the final state is an accept or reject state
-        final_state : list[int] = Teacher.final_state(s, dfa, alpha)
-        return bool(final_state[0])
-    
+    ##########################################################################################################
+
+    def member_batch(self, strings):
+        '''
+        Batched membership query: returns a list of booleans indicating whether each of the words is accepted or rejected by the Teacher.
+        Duplicate words and words which have already been answered are only looked up; the rest are answered together by _answer_batch()
+        :param strings: a list of words (tuples of symbol ids) to query
+        '''
+
+        # Answers to this batch (kept separately from the cache, which may evict some of them before the batch is finished)
+        answers = {}
+
+        # Remove duplicates (keeping the order of the strings) and look up the strings which have already been answered
+        to_answer = []
+        for s in dict.fromkeys(strings):
+            answer = self.answers.get(s)
+            if answer is None:
+                to_answer.append(s)
+            else:
+                answers[s] = answer
+
+        if to_answer:
+            self.membership_queries += len(to_answer)
+            for s, answer in zip(to_answer, self._answer_batch(to_answer)):
+                self.answers.put(s, answer)
+                answers[s] = answer
+
+        return [answers[s] for s in strings]
+
+    ##########################################################################################################
+
+    def _answer_batch(self, strings):
+        '''
+        Answers a list of membership queries which have not been answered before.
+        If the Teacher was given more than one process, the queries are split into chunks and answered by a pool of worker processes,
+        each of which holds its own copy of the Teacher (and its world); the answers are returned in the same order as the strings
+        :param strings: a list of strings to query
+        '''
+
+        # Answer small batches (and every batch, if only one process was requested) in this process
+        if self.processes <= 1 or len(strings) <= 1:
+            answer = self._answer
+            return [answer(s) for s in strings]
+
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(type(self), self._init_args, self._init_kwargs))
+
+        return self.pool.map(_worker_answer, strings, self.chunksize)
+
+    ##########################################################################################################
+
+    def close(self):
+        '''Shuts down the Teacher's worker processes, if any were started (they are started again if another batch is answered in parallel)'''
+
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    ##########################################################################################################
+
+    def _answer(self, s : tuple):
+        '''
+        Answers a single membership query, returning a boolean indicating whether s is accepted or rejected by the Teacher's DFA M.
+        Subclasses which do not have a DFA M override this method
+        :param s: a word to query
+        '''
+
+        assert self.m is not None
+
+        return self.m.accepts(s)
 
     ##########################################################################################################
 
@@ -629,7 +786,471 @@ class Teacher:
         
         return strg
 
+    ##########################################################################################################
+
+    def generate_word(self):
+        '''Generates a random world (see generate_string()) as a word of symbol ids in the Teacher's alphabet'''
+        return self.generate_words(1)[0]
+
+    ##########################################################################################################
+
+    def generate_words(self, n : int):
+        '''
+        Generates n random worlds at once, as words of symbol ids in the Teacher's alphabet.
+        The worlds follow the same distribution as generate_string(): an agent moving in a random direction on a random valid cell,
+        followed by 1 to MAX_NUM_GOALS goals on distinct random valid cells, listed in the order given by less_than()
+        :param n: the number of worlds to generate
+        '''
+
+        if self.cells is None:
+            self.__build_world_tables()
+
+        num_cells = len(self.cells)
+        rng = self.rng
+
+        # Agent direction (0 through 5) and cell
+        agent_dirs = rng.integers(0, 6, n)
+        agent_cells = rng.integers(0, num_cells, n)
+
+        # Number of goals in each world, and MAX_NUM_GOALS distinct goal cells for each world (the first num_goals of them are used)
+        num_goals = rng.integers(1, Teacher.MAX_NUM_GOALS + 1, n)
+        goal_cells = np.argsort(rng.random((n, num_cells)), axis=1)[:, :Teacher.MAX_NUM_GOALS]
+
+        # Sort each world's goals by their rank around its agent, moving the unused goals to the end
+        ranks = self.goal_rank[agent_dirs[:, None], agent_cells[:, None], goal_cells]
+        ranks[np.arange(Teacher.MAX_NUM_GOALS) >= num_goals[:, None]] = num_cells
+        goal_cells = np.take_along_axis(goal_cells, np.argsort(ranks, axis=1), axis=1)
+
+        # Convert the cells to symbol ids
+        agents = self.agent_ids[agent_dirs, agent_cells].tolist()
+        goals = self.goal_ids[goal_cells].tolist()
+
+        return [(agent, *goal_list[:count]) for agent, goal_list, count in zip(agents, goals, num_goals.tolist())]
+
+    ##########################################################################################################
+
+    def __build_world_tables(self):
+        '''
+        Precomputes the tables used by generate_words(): the cells on which idents can be placed, the symbol ids of an agent (in each direction)
+        and of a goal on each cell, and the rank of each goal cell in the order of less_than() for an agent on each cell in each direction
+        '''
+
+        # Every valid (matrix index, list index) of the world
+        self.cells = [(mi, li) for mi in range(16) for li in range(16) if make_alphabet.check_validity(f"f{mi:x}{li:x}")]
+        num_cells = len(self.cells)
+
+        self.agent_ids = np.array([[self.alphabet.id_of(f"{9 + d:x}{mi:x}{li:x}") for mi, li in self.cells] for d in range(6)])
+        self.goal_ids = np.array([self.alphabet.id_of(f"f{mi:x}{li:x}") for mi, li in self.cells])
+
+        # goal_rank[d, a, g] is the position of goal cell g when all goal cells are sorted for an agent in direction d on cell a.
+        # Goals are sorted by distance, then with the goals that stationary_ident() reports as stationary first, then by the size of their angle
+        # from the agent's direction, then by angle (the same order as less_than())
+        self.goal_rank = np.empty((6, num_cells, num_cells), dtype=np.int64)
+        for d in range(6):
+            for a, (agent_mi, agent_li) in enumerate(self.cells):
+                keys = []
+                for mi, li in self.cells:
+                    goal = [15, mi, li]
+                    distance, angle = Teacher.__get_distance_and_direction(goal, [9 + d, agent_mi, agent_li])
+                    keys.append((distance, not Teacher.stationary_ident(goal), abs(angle), angle))
+
+                order = sorted(range(num_cells), key=keys.__getitem__)
+                self.goal_rank[d, a, order] = np.arange(num_cells)
 
     ##########################################################################################################
 
+##############################################################################################################
+
+class World_Context:
+
+    ##########################################################################################################
+
+    def __init__(self, alphabet):
+        '''
+        World_Context constructor.
+        A World with its own pools of idents, in which the worlds described by words are built to answer membership queries
+        :param alphabet: the Alphabet of the words describing the worlds
+        '''
+
+        self.alphabet = alphabet
+
+        # The agent of the current world (the first ident described by the word)
+        self.my_agent = None
+
+        # Create empty world with space for idents
+        self.world = World(display_window=False)
+
+        # There is enough space for all regular idents and all goals in the ident list
+        # NOTE: May need to add space here if allowing multiple agents to be created
+        self.ident_list = []
+        for i in range(Teacher.MAX_NUM_IDENTS + Teacher.MAX_NUM_GOALS):
+            self.ident_list.append(Ident(matrix_index=-1, list_index=-1, world=self.world))
+       
+        # Slots for the agents and goals of the current world (filled in by create_world with idents from the ident list)
+        self.agents = [Ident(matrix_index=-1, list_index=-1, world=self.world, property="agent")]*10
+        
+        self.goal_list = [Ident(matrix_index=-1, list_index=-1, world=self.world, property="goal")]*Teacher.MAX_NUM_GOALS
+        
+        # How many agents and idents are currently being used
+        self.valid_idents = 0
+        self.valid_agents = 0
+
+        # Hexes to which create_world has added idents, with the number of idents each held before (so that only they need to be reset)
+        self.dirty_hexes = {}
+
+        self.wall_list = []
+
+        ''' walls just for the test case where things are a 5x5 square'''
+        # NOTE: Remove these walls and expand the number of valid characters in the alphabet to enable worlds larger thatn 5x5
+        for i in range(5, 12):
+            new_ident = Ident(5, i, self.world)
+            new_ident.state = -2
+            self.world.hex_matrix[5][i].idents.append(new_ident)
+            self.wall_list.append(new_ident)
+
+            new_ident2 = Ident(11, i, self.world)
+            new_ident2.state = -2
+            self.world.hex_matrix[11][i].idents.append(new_ident2)
+            self.wall_list.append(new_ident2)
+
+            new_ident3 = Ident(i, 5, self.world)
+            new_ident.state3 = -2
+            self.world.hex_matrix[i][5].idents.append(new_ident3)
+            self.wall_list.append(new_ident3)
+
+            new_ident4 = Ident(i, 11, self.world)
+            new_ident4.state = -2
+            self.world.hex_matrix[i][11].idents.append(new_ident4)
+            self.wall_list.append(new_ident4)
+        
+
+        self.surrounding_walls : int = len(self.wall_list)
+        self.valid_walls : int = self.surrounding_walls
+
+        # NOTE: This may need to be adjusted depending on the number of other (non-ring) walls allowed to be created
+        for i in range (50):
+            self.wall_list.append(Ident(matrix_index=-1, list_index=-1, world=self.world, state=-2))
+
+    ##########################################################################################################
+
+    def create_world(self, s : tuple):
+        '''
+        Creates an iteration of World from hexv2.py with the arrangement specified in s (leaving its agent in self.my_agent).
+        Note that it does not create a completely new world, but sets certain idents to be "valid" as an effort for memory storage.
+        Only the hexes changed by the previous world are reset, and the idents come from fixed pools (which only grow if a world needs more idents than
+        any world before it), so the cost of a world does not depend on the size of the hex matrix or on the number of worlds created before it.
+        :param s: The word (tuple of symbol ids) that represents the world, each symbol being 3 hexadecimal characters (ie. f66 is a goal ident in position 6, 6 on the hex grid)
+        '''
+    
+        # Reset trackers how many idents are valid
+        self.valid_idents = 0
+        self.valid_agents = 0
+        self.valid_goals = 0
+        self.valid_walls = self.surrounding_walls
+
+        # Remove the idents added by the previous world from the hexes it changed (any idents the hexes held before, like the ring walls, stay)
+        # (clearing a hex which was empty is cheaper than deleting a slice, after which the hex rebuilds its bitmask, see Hex_Idents)
+        for hex, num_idents in self.dirty_hexes.items():
+            if num_idents:
+                del hex.idents[num_idents:]
+            else:
+                hex.idents.clear()
+        self.dirty_hexes.clear()
+
+        # Parse word into world
+        decoded = self.alphabet.decoded
+        for i, symbol_id in enumerate(s):
+
+            # the three hexadecimal characters of the symbol, decoded when the alphabet was built
+            property, mi, li = decoded[symbol_id]
+            
+            
+            # The first char in ever "letter" (3-char string) form the property
+            # The properties are wall (0), stationary non-agent (1), moving agent (in directions 0 through 5, 1 through 7),
+            # stationary agent (8), moving agent (in directions 0 through 5, 9 through e), and goal (f)
+
+            # 0 => wall
+            if property == 0:
+                if self.valid_walls == len(self.wall_list):
+                    self.wall_list.append(Ident(matrix_index=-1, list_index=-1, world=self.world, state=-2))
+                new_ident = self.wall_list[self.valid_walls]
+
+                new_ident.matrix_index = mi
+                new_ident.list_index = li
+                assert new_ident.world == self.world
+
+                new_ident.state = -2
+                self.valid_walls += 1
+
+            # If not a wall, it goes on the ident list
+            # (It already is on the ident list, but we iterate to indicate that it is valid)
+            else:
+                if self.valid_idents == len(self.ident_list):
+                    self.ident_list.append(Ident(matrix_index=-1, list_index=-1, world=self.world))
+                new_ident = self.ident_list[self.valid_idents]
+
+                new_ident.matrix_index = mi
+                new_ident.list_index = li
+                assert new_ident.world == self.world
+
+                # Clear any property (ex. "goal") left over from the last world which used this ident
+                new_ident.property = None
+                self.valid_idents += 1
+
+                hex = self.world.hex_matrix[mi][li]
+                self.dirty_hexes.setdefault(hex, len(hex.idents))
+
+
+            # Set the new ident's state
+
+            # 1 => stationary (non-agent)
+            if property == 1:
+                new_ident.state = -1
+            
+            # 2 => direction 0 (non-agent)
+            # 3 => direction 1 (non-agent)
+            # 4 => direction 2 (non-agent)
+            # 5 => direction 3 (non-agent)
+            # 6 => direction 4 (non-agent)
+            # 7 => direction 5 (non-agent)
+            elif property >= 2 and property <= 7:
+                new_ident.state = property - 2
+            
+            # 8 => stationary (agent)
+            if property == 8:
+                new_ident.state = -1
+                self.__fill_slot(self.agents, self.valid_agents, new_ident)
+                self.valid_agents += 1
+            
+            # 9 => direction 0 (agent)
+            # 10 => direction 1 (agent)
+            # 11 => direction 2 (agent)
+            # 12 => direction 3 (agent)
+            # 13 => direction 4 (agent)
+            # 14 => direction 5 (agent)
+            elif property >= 9 and property <= 14:
+                new_ident.state = property - 9
+                self.__fill_slot(self.agents, self.valid_agents, new_ident)
+                self.valid_agents += 1
+
+
+            # 15 => goal (stationary)
+            elif property == 15:
+                new_ident.state = -1
+                # Mark as goal
+                new_ident.property = "goal"
+                self.__fill_slot(self.goal_list, self.valid_goals, new_ident)
+                self.valid_goals += 1
+
+            # Add the ident to its hex once its state and property are set (the hex keeps a bitmask of them, see Hex_Idents)
+            if property != 0:
+                hex.idents.append(new_ident)
+
+            
+            # Save the first ident described in the string as my_agent
+            if i == 0:
+                self.my_agent = new_ident
+
+        
+        # Set world to only contain valid idents by slicing lists stored in self
+        self.world.ident_list = self.ident_list[0:self.valid_idents]
+        self.world.agents = self.agents[0:self.valid_agents]
+        self.world.wall_list = self.wall_list[0:self.valid_walls]
+        self.world.goals = self.goal_list[0:self.valid_goals]
+        assert self.my_agent.world == self.world
+
+    @staticmethod
+    def __fill_slot(slots, index, ident):
+        '''
+        Puts ident in slots[index], adding a slot if index is past the end of slots (slots are never inserted into or removed)
+        :param slots: the list of slots (ex. self.goal_list)
+        :param index: the index of the slot to fill
+        :param ident: the Ident to put in the slot
+        '''
+
+        if index == len(slots):
+            slots.append(ident)
+        else:
+            slots[index] = ident
+
+    ##########################################################################################################
+
+    def next_move(self):
+        '''Returns the next move (0, 1 or -1) of the agent of the current world, as given by Ident.find_next_move()'''
+
+        assert self.world
+        assert self.my_agent
+
+        return Ident.find_next_move(self.my_agent)
+
+##############################################################################################################
+
+class Membership_Cache:
+
+    ##########################################################################################################
+
+    def __init__(self, max_size:int):
+        '''
+        Size-bounded cache of membership query answers which evicts the least recently used answer when it is full.
+        The cache can be used from several threads at once
+        :param max_size: the maximum number of answers held by the cache
+        '''
+
+        assert max_size > 0
+        self.max_size = max_size
+
+        self.lock = threading.Lock()
+
+        # Answers to membership queries with the queried words as keys, ordered from least to most recently used
+        self.entries = OrderedDict()
+
+        # Counters for how the cache is being used
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    ##########################################################################################################
+
+    def __len__(self):
+        '''Returns the number of answers held by the cache'''
+        return len(self.entries)
+
+    def __contains__(self, word):
+        '''Returns a boolean indicating if the answer for the word is held by the cache (does not count as a use of the answer)'''
+        return word in self.entries
+
+    ##########################################################################################################
+
+    def get(self, word):
+        '''
+        Returns the cached answer for the word, or None if the word's answer is not in the cache
+        :param word: the queried word
+        '''
+
+        with self.lock:
+            answer = self.entries.get(word)
+
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(word)
+
+        return answer
+
+    ##########################################################################################################
+
+    def put(self, word, answer:bool):
+        '''
+        Stores the answer for the word, evicting the least recently used answer if the cache is full
+        :param word: the queried word
+        :param answer: the answer to the membership query
+        '''
+
+        with self.lock:
+            self.entries[word] = answer
+            self.entries.move_to_end(word)
+
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    ##########################################################################################################
+
+    def clear(self):
+        '''Removes every answer from the cache and resets its counters'''
+
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+##############################################################################################################
+
+class Sample_Pool:
+
+    ##########################################################################################################
+
+    def __init__(self):
+        '''
+        Sample_Pool constructor.
+        A growing pool of words with their membership query answers, kept packed (see DFA.pad_words()) so that a DFA can be checked against all of them at once
+        '''
+
+        # The words in the pool, in the order they were added
+        self.words = []
+
+        # The words packed into a matrix of symbol ids (one word per row), their lengths, and their answers
+        self.matrix = np.full((0, 0), DFA.PAD, dtype=np.int32)
+        self.lengths = np.zeros(0, dtype=np.int64)
+        self.answers = np.zeros(0, dtype=bool)
+
+    ##########################################################################################################
+
+    def __len__(self):
+        '''Returns the number of words in the pool'''
+        return len(self.words)
+
+    ##########################################################################################################
+
+    def add(self, words, answers):
+        '''
+        Adds words and their membership query answers to the pool
+        :param words: the list of words being added
+        :param answers: the answers to the membership queries on the words (in the same order)
+        '''
+
+        assert len(words) == len(answers)
+
+        matrix, lengths = DFA.pad_words(words)
+
+        # Pad the narrower of the two matrices so that the new rows can be stacked under the old ones
+        width = max(self.matrix.shape[1], matrix.shape[1])
+        self.matrix = np.vstack((np.pad(self.matrix, ((0, 0), (0, width - self.matrix.shape[1])), constant_values=DFA.PAD),
+                                 np.pad(matrix, ((0, 0), (0, width - matrix.shape[1])), constant_values=DFA.PAD)))
+
+        self.words.extend(words)
+        self.lengths = np.concatenate((self.lengths, lengths))
+        self.answers = np.concatenate((self.answers, np.asarray(answers, dtype=bool)))
+
+    ##########################################################################################################
+
+    def find_mismatch(self, dfa):
+        '''
+        Returns the first word in the pool whose answer the DFA gets wrong, or None if the DFA agrees with every answer
+        :param dfa: the DFA being checked
+        '''
+
+        if not self.words:
+            return None
+
+        accepted = dfa.table[dfa.run_encoded(self.matrix, self.lengths), 0].astype(bool)
+        mismatches = np.flatnonzero(accepted != self.answers)
+
+        return self.words[mismatches[0]] if mismatches.size else None
+
+##############################################################################################################
+
+# The copy of the Teacher held by a worker process (built once, when the worker starts)
+_worker_teacher = None
+
+def _init_worker(teacher_class, init_args, init_kwargs):
+    '''
+    Builds the Teacher used by a worker process of Teacher.pool
+    :param teacher_class: the class (Teacher or one of its subclasses) of the Teacher which started the pool
+    :param init_args: the positional arguments that Teacher was constructed with
+    :param init_kwargs: the keyword arguments that Teacher was constructed with (which matter to the workers)
+    '''
+
+    global _worker_teacher
+    _worker_teacher = teacher_class(*init_args, **init_kwargs)
+
+def _worker_answer(s : tuple):
+    '''
+    Answers a single membership query with the worker process's Teacher
+    :param s: a word to query
+    '''
+    return _worker_teacher._answer(s)
+
 ##############################################################################################################
\ No newline at end of file
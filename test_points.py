@@ -1,29 +1,23 @@
-from l_star_tester import read_alphabet
-from l_star_tester import read_dfa
 import os
 import sys
 from teacher import Teacher
-import make_alphabet
-import random
+from dfa import DFA
+from alphabet import Alphabet
+import numpy as np
 from hex_world import World, Ident
 # import pdb; pdb.set_trace()
 
 
 ##########################################################################################################
 
-# Returns the agent's move in reaction to the passed world-string
-def __get_move(s : str):
+# Returns the agent's moves in reaction to the passed world-strings (all strings are run through the DFAs at once)
+def __get_moves(strings):
     
-    movement = mov_teach.member(s, movement_dfa, alphabet)
-    direction = dir_teach.member(s, direction_dfa, alphabet)
-    print(f"movement {movement}, direction {direction}")
-
-    if not movement:
-        return 0
-    elif direction:
-        return 1
-    else:
-        return -1
+    movement = movement_dfa.accepts_many(strings)
+    direction = direction_dfa.accepts_many(strings)
+
+    # 0 if the agent does not turn, else 1 for a clockwise turn and -1 for a counterclockwise turn
+    return np.where(movement, np.where(direction, 1, -1), 0)
     
 
 ##########################################################################################################
@@ -37,63 +31,49 @@ It will print out a tally of the number of incorrectly and correctly determined
 # read alphabet from the saved alphabet.txt file
 # (NOTE: the alphabet will have been previously created for learning the DFA with the make_alphabet.py)
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
-alphabet = read_alphabet(__location__)
+alphabet = Alphabet.from_file(os.path.join(__location__, "alphabet.txt"))
 print("alphabet parsed")
 
 # Parse DFAs saved to text files
-movement_dfa = read_dfa(__location__, "movement_dfa.txt", alphabet=alphabet)
-direction_dfa = read_dfa(__location__, "direction_dfa.txt", alphabet=alphabet)
+movement_dfa = DFA.from_file(os.path.join(__location__, "movement_dfa.txt"), alphabet)
+direction_dfa = DFA.from_file(os.path.join(__location__, "direction_dfa.txt"), alphabet)
 print("dfas parsed")
 
-# initialize Teachers using our generated DFAs as the premade_dfa to put into the Teacher
-mov_teach = Teacher(alphabet, premade_dfa = movement_dfa)
+# initialize a Teacher using our generated DFA as the premade_dfa to put into the Teacher (it is used to build the worlds)
 dir_teach = Teacher(alphabet, premade_dfa = direction_dfa)
 
 # TODO: adapt test_points.py for various alphabet inputs based on changes made to the types of strings inputted into solver.py ?
 
 goals = ['f66', 'f67', 'f68', 'f69', 'f6a', 'f76', 'f77', 'f78', 'f79', 'f7a','f86', 'f87', 'f88', 'f89', 'f8a', 'f96', 'f97', 'f98', 'f99', 'f9a', 'fa6', 'fa7', 'fa8', 'fa9', 'faa']
 
-tally = 0
-true_tally = 0
-# tally is the number of incorrect results, true_tally is the number of correct results
-
-for i in range(0, 10000):
-    strg = ""
-
-    my_agent = ""
-    while not make_alphabet.check_validity(my_agent):
-        my_agent = ""
-        agent_dir = random.randint(9, 14)
-        agent_mi = random.randint(0, 15)
-        agent_li = random.randint(0, 15)
-        # TODO: Check that this hex method correctly converts and returns a string
-        my_agent += hex(agent_dir)[2] + hex(agent_mi)[2] + hex(agent_li)[2]
+# ids of every valid agent (moving in directions 0 through 5, 9 through e) and of the goals above
+agent_ids = np.array([alphabet.id_of(symbol) for symbol in alphabet if 9 <= int(symbol[0], 16) <= 14])
+goal_ids = np.array([alphabet.id_of(goal) for goal in goals])
 
-    assert my_agent
+# Draw all of the worlds at once: a random valid agent followed by three random goals
+# TODO: make it so more than one goal goes into some of the text strings please???
+rng = np.random.default_rng()
+test_agents = agent_ids[rng.integers(0, len(agent_ids), 10000)]
+test_goals = goal_ids[rng.integers(0, len(goal_ids), (10000, 3))]
+words = [(agent, *world_goals) for agent, world_goals in zip(test_agents.tolist(), test_goals.tolist())]
 
-    # Save valid agent
-    strg += my_agent
+test_strings = []
+world_moves = []
 
-    # select one random goal for the string
-    # TODO: make it so more than one goal goes into some of the text strings please???
-    for j in range(0, 3):
-        goal = goals[random.randint(0, 24)]
-
-        strg += goal
-
-    dir_teach._create_world(strg)
+for word in words:
+    dir_teach._create_world(word)
     assert dir_teach.my_agent
     agent_dir = Ident.find_next_move(dir_teach.my_agent)
 
-    print(f"World says result is agent move: {agent_dir}")
-    test = __get_move(strg)
-    print(f"DFA says agent move from string {strg}: {test}")
-    if(agent_dir != test):
-        tally += 1
-    if(agent_dir == test):
-        true_tally += 1
+    test_strings.append(word)
+    world_moves.append(agent_dir)
 
-    print()
+# Run every test string through the DFAs in one pass
+dfa_moves = __get_moves(test_strings)
+
+# tally is the number of incorrect results, true_tally is the number of correct results
+true_tally = int(np.count_nonzero(dfa_moves == np.array(world_moves)))
+tally = len(test_strings) - true_tally
 
 print(f"Incorrect DFA outcomes: {tally} / 10,000")
 print(f"Correct DFA outcomes: {true_tally} / 10,000")
\ No newline at end of file